@@ -0,0 +1,148 @@
+"""Game-server API client shared by fp.py and game_multiplayer.py.
+
+ScoreBatcher queues finished games and sends them from a background thread,
+so the render loop never waits on the network. follow_leaderboard keeps a
+copy of the all-time top N current from the server's long-poll feed.
+"""
+import threading
+import time
+
+import requests
+
+
+class ScoreBatcher:
+    """Buffers finished games and posts them to /score/submit_batch from one worker thread.
+
+    Scores that arrive within FLUSH_DELAY of each other share one HTTP request
+    and one server-side commit. Scores stay queued while the server can't be
+    reached; ones it rejects as invalid (4xx) are dropped rather than resent.
+    A server without the batch endpoint gets one /score/submit per score.
+    Call flush() before exiting so the last game isn't lost.
+    """
+    FLUSH_DELAY = 1.5
+    RETRY_DELAY = 5.0
+    MAX_BATCH = 50
+    MAX_PENDING = 500
+
+    def __init__(self, api_url, timeout=3.0):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.batch_endpoint = True
+        self.pending = []
+        self.cond = threading.Condition()
+        # Held while sending, so flush() and the worker never send the same scores
+        self.sending = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add(self, player_id, score, duration):
+        with self.cond:
+            self.pending.append({"player_id": player_id, "score": score, "duration": duration, "pipes_passed": score})
+            # Offline for a long time: drop the oldest rather than grow forever
+            del self.pending[:-self.MAX_PENDING]
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+            # Let a burst of game-overs collect before sending
+            time.sleep(self.FLUSH_DELAY)
+            with self.sending:
+                sent = self.send_next()
+            if not sent:
+                time.sleep(self.RETRY_DELAY)
+
+    def flush(self):
+        """Send everything still queued from the calling thread; returns how
+        many scores could not be sent"""
+        with self.sending:
+            while self.pending and self.send_next():
+                pass
+        with self.cond:
+            return len(self.pending)
+
+    def send_next(self):
+        """Send the oldest queued batch; False if some of it must wait for a retry"""
+        with self.cond:
+            batch = self.pending[:self.MAX_BATCH]
+        if not batch:
+            return True
+        done = self.post_batch(batch) if self.batch_endpoint else self.post_each(batch)
+        with self.cond:
+            del self.pending[:done]
+        return done == len(batch)
+
+    def post_batch(self, batch):
+        """POST to /score/submit_batch; returns how many scores are settled"""
+        try:
+            r = requests.post(f"{self.api_url}/score/submit_batch", json={"sessions": batch}, timeout=self.timeout)
+        except requests.RequestException:
+            return 0
+        if r.status_code in (404, 405):
+            # An older server without the batch endpoint
+            self.batch_endpoint = False
+            return self.post_each(batch)
+        if r.status_code == 200:
+            # Scores the server rejected are listed in its results; resending won't help
+            return len(batch)
+        if 400 <= r.status_code < 500:
+            print(f"⚠️ Server rejected {len(batch)} scores ({r.status_code}), dropping them")
+            return len(batch)
+        return 0
+
+    def post_each(self, batch):
+        """POST the scores one at a time to /score/submit; returns how many are settled"""
+        for done, session in enumerate(batch):
+            try:
+                r = requests.post(f"{self.api_url}/score/submit", json=session, timeout=self.timeout)
+            except requests.RequestException:
+                return done
+            if 400 <= r.status_code < 500:
+                print(f"⚠️ Server rejected a score ({r.status_code}), dropping it")
+            elif r.status_code != 200:
+                return done
+        return len(batch)
+
+
+def apply_leaderboard_update(board, message):
+    """Apply a snapshot or top-N delta from the leaderboard feed. Returns None
+    if the delta doesn't cover the ranks `board` is missing; ask for a
+    snapshot then."""
+    if message['type'] == 'snapshot':
+        return list(message['leaderboard'])
+    size = message['size']
+    board = board[:size] + [None] * (size - len(board))
+    for row in message['changes']:
+        board[row['rank'] - 1] = row
+    return None if None in board else board
+
+
+def follow_leaderboard(api_url, callback, interval=5.0, timeout=25):
+    """Long-poll the leaderboard feed forever, calling callback(board) with
+    the whole top N whenever it changes. Run it on a daemon thread.
+
+    Polls start at most every `interval` seconds, so a server that answers at
+    once (push turned off, or an error) isn't hammered.
+    """
+    board, since = [], None
+    while True:
+        started = time.monotonic()
+        try:
+            params = {"timeout": timeout}
+            if since:
+                params.update(epoch=since[0], since=since[1])
+            r = requests.get(f"{api_url}/leaderboard/poll", params=params, timeout=timeout + 10)
+            message = r.json() if r.status_code == 200 else {'type': 'none'}
+            if message['type'] in ('snapshot', 'delta'):
+                updated = apply_leaderboard_update(board, message)
+                if updated is None:
+                    # Out of step with the server: start over from a snapshot
+                    since = None
+                else:
+                    board, since = updated, (message['epoch'], message['seq'])
+                    callback(board)
+        except (requests.RequestException, ValueError, KeyError):
+            pass
+        time.sleep(max(interval - (time.monotonic() - started), 0))
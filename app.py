@@ -1,6 +1,12 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, make_response, render_template, g
 from flask_cors import CORS
 import sqlite3
+import json
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
 from datetime import datetime
 import os
 
@@ -9,21 +15,70 @@ CORS(app)
 
 # Handle database path for deployment
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE = os.path.join(BASE_DIR, 'flappybird.db')
+DATABASE = os.environ.get('FLAPPYBIRD_DB', os.path.join(BASE_DIR, 'flappybird.db'))
 
-def get_db():
-    """Create a database connection"""
-    conn = sqlite3.connect(DATABASE)
+# Connection pool settings
+DB_POOL_SIZE = 8
+DB_BUSY_TIMEOUT = 5.0
+DB_CACHED_STATEMENTS = 256
+
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+def connect_db(readonly=False):
+    """Open a new tuned database connection"""
+    conn = sqlite3.connect(
+        f'file:{DATABASE}?mode=ro' if readonly else DATABASE,
+        timeout=DB_BUSY_TIMEOUT,
+        check_same_thread=False,
+        cached_statements=DB_CACHED_STATEMENTS,
+        uri=readonly
+    )
     conn.row_factory = sqlite3.Row
+    # WAL (set once in init_db) lets readers run alongside the writer, which
+    # makes NORMAL sync safe: a crash can lose the last commit, never corrupt
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA cache_size = -16000')
+    conn.execute('PRAGMA mmap_size = 67108864')
+    conn.execute('PRAGMA temp_store = MEMORY')
     return conn
 
-def init_db():
-    """Initialize the database with required tables"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Players table
-    cursor.execute('''
+def acquire_db():
+    """Take a connection from the pool, opening one if the pool is empty"""
+    try:
+        return _db_pool.get_nowait()
+    except queue.Empty:
+        return connect_db()
+
+def release_db(conn):
+    """Return a connection to the pool, discarding any unfinished transaction"""
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _db_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+def get_db():
+    """Get the pooled database connection for the current request"""
+    if 'db' not in g:
+        g.db = acquire_db()
+    return g.db
+
+@app.teardown_appcontext
+def teardown_db(exception):
+    """Hand the request's connection back to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        release_db(conn)
+
+# ============= SCHEMA MIGRATIONS =============
+# Each migration runs once, in order, inside its own transaction. The number
+# of applied migrations is stored in PRAGMA user_version. Append new ones to
+# MIGRATIONS; never edit one that has shipped.
+
+def migration_base_tables(conn):
+    """Players, scores and game sessions"""
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS players (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -31,8 +86,7 @@ def init_db():
         )
     ''')
     
-    # Scores table
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS scores (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             player_id INTEGER NOT NULL,
@@ -42,8 +96,7 @@ def init_db():
         )
     ''')
     
-    # Game sessions table
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS game_sessions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             player_id INTEGER NOT NULL,
@@ -54,13 +107,481 @@ def init_db():
             FOREIGN KEY (player_id) REFERENCES players (id)
         )
     ''')
+
+def migration_player_best(conn):
+    """Per-player best score table, kept current by submit_score so the
+    all-time leaderboard is an index scan instead of a full aggregate"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_best (
+            player_id INTEGER PRIMARY KEY,
+            best_score INTEGER NOT NULL,
+            games_played INTEGER NOT NULL DEFAULT 0,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (player_id) REFERENCES players (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_player_best_score
+        ON player_best (best_score DESC)
+    ''')
+    backfill_player_best(conn)
+
+def migration_lookup_indexes(conn):
+    """Indexes for per-player lookups and the today/week range filters"""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_scores_player_score
+        ON scores (player_id, score)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_scores_created_at
+        ON scores (created_at)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sessions_player_created
+        ON game_sessions (player_id, created_at)
+    ''')
+
+def migration_global_stats(conn):
+    """Single-row running totals behind /api/stats/global, kept current by
+    record_session so the dashboard never aggregates game_sessions"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS global_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_players INTEGER NOT NULL DEFAULT 0,
+            total_games INTEGER NOT NULL DEFAULT 0,
+            highest_score INTEGER,
+            score_sum INTEGER NOT NULL DEFAULT 0,
+            total_playtime REAL,
+            top_player_id INTEGER,
+            FOREIGN KEY (top_player_id) REFERENCES players (id)
+        )
+    ''')
+    rebuild_global_stats(conn)
+
+MIGRATIONS = [
+    migration_base_tables,
+    migration_player_best,
+    migration_lookup_indexes,
+    migration_global_stats,
+]
+
+def migrate(conn):
+    """Apply every migration newer than the database's user_version"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute('BEGIN')
+        try:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def init_db():
+    """Initialize the database and bring its schema up to date"""
+    conn = connect_db()
     
-    conn.commit()
+    # Write-ahead logging is persistent, but can't be switched inside a transaction
+    conn.execute('PRAGMA journal_mode = WAL')
+    migrate(conn)
     conn.close()
 
+def backfill_player_best(conn):
+    """Rebuild player_best from the raw scores table"""
+    conn.execute('DELETE FROM player_best')
+    conn.execute('''
+        INSERT INTO player_best (player_id, best_score, games_played, total_score)
+        SELECT player_id, MAX(score), COUNT(*), SUM(score)
+        FROM scores
+        GROUP BY player_id
+    ''')
+
+def rebuild_global_stats(conn):
+    """Recompute the global_stats row from the raw sessions and scores"""
+    conn.execute('DELETE FROM global_stats')
+    conn.execute('''
+        INSERT INTO global_stats (
+            id, total_players, total_games, highest_score,
+            score_sum, total_playtime, top_player_id
+        )
+        SELECT
+            1,
+            COUNT(DISTINCT player_id),
+            COUNT(*),
+            MAX(score),
+            COALESCE(SUM(score), 0),
+            SUM(duration),
+            (SELECT player_id FROM scores ORDER BY score DESC, id LIMIT 1)
+        FROM game_sessions
+    ''')
+
+@app.cli.command('backfill-best-scores')
+def backfill_best_scores_command():
+    """Rebuild the per-player best score table from all recorded scores"""
+    conn = get_db()
+    backfill_player_best(conn)
+    conn.commit()
+    count = conn.execute('SELECT COUNT(*) FROM player_best').fetchone()[0]
+    print(f"player_best rebuilt for {count} players")
+
+@app.cli.command('check-global-stats')
+def check_global_stats_command():
+    """Compare the running global totals with the raw data, then rebuild them"""
+    conn = connect_db()
+    try:
+        stored = query_global_stats(conn)['stats']
+        backfill_player_best(conn)
+        rebuild_global_stats(conn)
+        rebuilt = query_global_stats(conn)['stats']
+        conn.commit()
+    finally:
+        conn.close()
+    
+    drift = {
+        key: (stored.get(key), rebuilt.get(key))
+        for key in rebuilt.keys() | stored.keys()
+        if stored.get(key) != rebuilt.get(key)
+    }
+    if not drift:
+        print("global_stats consistent with game_sessions")
+    for key, (was, now) in sorted(drift.items()):
+        print(f"{key}: stored {was!r}, rebuilt {now!r}")
+
+# Statements whose full scan is cut short by a LIMIT carry this marker
+BOUNDED_SCAN_MARKER = '-- bounded scan'
+
+def explain_statements(conn, run):
+    """Run `run(conn)` and return (sql, plan lines) for each statement it executed"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        run(conn)
+    finally:
+        conn.set_trace_callback(None)
+    
+    plans = []
+    for sql in statements:
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        rows = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+        plans.append((sql, [row[3] for row in rows]))
+    return plans
+
+def is_full_scan(detail):
+    """A plan step that walks a whole table or index rather than a range of it"""
+    return detail.startswith('SCAN ') and detail != 'SCAN CONSTANT ROW'
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN the read endpoints' queries and fail on any unbounded full scan"""
+    conn = get_db()
+    player = conn.execute('SELECT MIN(id) FROM players').fetchone()[0] or 0
+    checks = [
+        ('leaderboard all', lambda c: query_leaderboard(c, 'all', 10)),
+        ('leaderboard today', lambda c: query_leaderboard(c, 'today', 10)),
+        ('leaderboard week', lambda c: query_leaderboard(c, 'week', 10)),
+        ('player stats', lambda c: query_player_stats(c, player)),
+        ('global stats', query_global_stats),
+        ('data version', query_data_version),
+    ]
+    
+    failures = 0
+    with app.test_request_context():
+        for name, run in checks:
+            for sql, plan in explain_statements(conn, run):
+                scans = [d for d in plan if is_full_scan(d)]
+                bad = scans and BOUNDED_SCAN_MARKER not in sql
+                failures += bool(bad)
+                print(f"{'FAIL' if bad else 'ok':4}  {name}")
+                for detail in plan:
+                    print(f"        {detail}")
+    
+    if failures:
+        raise SystemExit(f"{failures} statement(s) scan a full table or index")
+
 # Initialize database on startup
 init_db()
 
+# ============= RESPONSE CACHE =============
+
+class ResponseCache:
+    """Bounded LRU cache of read-endpoint payloads.
+    
+    Every write bumps `version`, which makes all earlier entries stale, so
+    polling clients cost one query per change instead of one per poll. The
+    TTL bounds staleness when several worker processes share the database,
+    since each worker only sees its own writes.
+    """
+    
+    def __init__(self, max_entries=256, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> [lock, users] for keys being filled right now
+        self._fills = {}
+    
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        version, expires, payload = entry
+        if version != self.version or expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return payload
+    
+    def get_or_compute(self, key, compute, counted=True):
+        """Return the cached payload for key, computing it on a miss.
+        
+        Lookups with counted=False are left out of the hit/miss stats.
+        """
+        with self._lock:
+            payload = self._lookup(key)
+            if payload is not None:
+                self.hits += counted
+                return payload
+            fill = self._fills.setdefault(key, [threading.Lock(), 0])
+            fill[1] += 1
+        
+        # One filler per key, so a burst of polls after a write runs the
+        # query once and the rest find the fresh entry, while misses on
+        # other keys don't wait behind a slow query
+        try:
+            with fill[0]:
+                with self._lock:
+                    payload = self._lookup(key)
+                    if payload is not None:
+                        self.hits += counted
+                        return payload
+                    self.misses += counted
+                    version = self.version
+                
+                payload = compute()
+                
+                with self._lock:
+                    # A write during compute leaves this result already stale
+                    if version == self.version:
+                        self._entries[key] = (version, time.monotonic() + self.ttl, payload)
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+                return payload
+        finally:
+            with self._lock:
+                fill[1] -= 1
+                if not fill[1]:
+                    del self._fills[key]
+    
+    def invalidate(self):
+        """Mark every cached payload stale after a write"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+    
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'version': self.version
+            }
+
+response_cache = ResponseCache()
+
+# ============= LEADERBOARD FEED =============
+
+class LeaderboardFeed:
+    """Pushes changes to the all-time top N to SSE and long-poll subscribers.
+    
+    Writers call publish() after committing. It re-reads the top N and only
+    wakes subscribers when a row actually changed. Each change is a delta of
+    the ranks that differ; a subscriber that fell too far behind, that
+    connects for the first time, or whose position is from another process
+    gets a full snapshot instead.
+    
+    A position is (epoch, seq). Every process starts a new epoch, so a seq
+    from before a restart, or from another worker, is never mistaken for one
+    of this process's. Each worker only publishes its own writes, so while
+    subscribers wait the board is also re-read every `resync` seconds to
+    pick up the others'.
+    """
+    
+    def __init__(self, size=50, history=64, resync=5.0):
+        self.size = size
+        self.resync = resync
+        self.epoch = os.urandom(4).hex()
+        self.seq = 0
+        self.board = None
+        self._deltas = deque(maxlen=history)
+        self._cond = threading.Condition()
+        # Held from each read to its apply, so a slow writer can't apply an
+        # older board over a newer one
+        self._publish_lock = threading.Lock()
+        self._next_resync = 0.0
+    
+    @property
+    def position(self):
+        return (self.epoch, self.seq)
+    
+    def _read_board(self, conn):
+        return query_leaderboard(conn, 'all', self.size)['leaderboard']
+    
+    def _borrow_and_read(self):
+        # Subscribers hold their request open for a long time, so borrow a
+        # connection just for this read instead of pinning one to the request
+        conn = acquire_db()
+        try:
+            return self._read_board(conn)
+        finally:
+            release_db(conn)
+    
+    def ensure_loaded(self):
+        """Load the initial board before the first subscriber waits on it"""
+        if self.board is not None:
+            return
+        with self._publish_lock:
+            if self.board is None:
+                board = self._borrow_and_read()
+                with self._cond:
+                    self.board = board
+    
+    def publish(self, conn):
+        """Record a new top-N delta if the last write changed the board"""
+        with self._publish_lock:
+            self._apply(self._read_board(conn))
+    
+    def resync_if_due(self):
+        """Re-read the board for writes made by other processes, at most once
+        every `resync` seconds however many subscribers ask"""
+        with self._publish_lock:
+            now = time.monotonic()
+            if now < self._next_resync:
+                return
+            self._next_resync = now + self.resync
+            if self._apply(self._borrow_and_read()):
+                # Another worker wrote, so this one's cached reads are stale too
+                response_cache.invalidate()
+    
+    def _apply(self, board):
+        with self._cond:
+            old = self.board or []
+            changes = [
+                dict(row, rank=rank)
+                for rank, row in enumerate(board, start=1)
+                if rank > len(old) or old[rank - 1] != row
+            ]
+            if not changes and len(board) == len(old):
+                return False
+            self.seq += 1
+            self._deltas.append((self.seq, changes, len(board)))
+            self.board = board
+            self._cond.notify_all()
+            return True
+    
+    def _message(self, since):
+        # Merge the deltas after `since` if it is this process's and all of
+        # them are still held
+        if (since is not None and since[0] == self.epoch and self._deltas
+                and self._deltas[0][0] <= since[1] + 1 <= self.seq):
+            merged = {}
+            for seq, changes, size in self._deltas:
+                if seq > since[1]:
+                    for row in changes:
+                        merged[row['rank']] = row
+            size = self._deltas[-1][2]
+            return {
+                'type': 'delta',
+                'epoch': self.epoch,
+                'seq': self.seq,
+                'size': size,
+                'changes': [row for rank, row in sorted(merged.items()) if rank <= size]
+            }
+        return {
+            'type': 'snapshot',
+            'epoch': self.epoch,
+            'seq': self.seq,
+            'size': len(self.board),
+            'leaderboard': self.board
+        }
+    
+    def wait(self, since, timeout):
+        """Block until the board moves past the position `since`; None on timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                remaining = max(deadline - time.monotonic(), 0)
+                if self._cond.wait_for(lambda: self.position != since, min(remaining, self.resync)):
+                    return self._message(since)
+            if time.monotonic() >= deadline:
+                return None
+            self.resync_if_due()
+
+leaderboard_feed = LeaderboardFeed()
+
+# Seconds between SSE keep-alive comments and the longest long-poll wait
+FEED_KEEPALIVE = 15
+FEED_MAX_WAIT = 30
+# An SSE response ends after this many seconds; EventSource reconnects
+# FEED_RETRY_MS later and resumes from its Last-Event-ID
+FEED_STREAM_SECONDS = 60
+FEED_RETRY_MS = 3000
+# Push holds a request open, which pins a worker on sync WSGI hosts such as
+# PythonAnywhere. Set FLAPPYBIRD_PUSH=0 there: the stream then answers 204,
+# so browsers fall back to interval refreshes, and long-polls return at once
+FEED_PUSH = os.environ.get('FLAPPYBIRD_PUSH', '1') != '0'
+
+# ============= CONDITIONAL GET =============
+
+def query_data_version(conn):
+    """Newest session and player ids; any write that can change a read moves one"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT
+            (SELECT MAX(id) FROM game_sessions),
+            (SELECT MAX(id) FROM players)
+    ''')
+    sessions, players = cursor.fetchone()
+    return (sessions or 0, players or 0)
+
+def make_etag(*key, conn_factory=None):
+    """Version tag for a read endpoint's response to the given parameters"""
+    # Cached until the next write, so a revalidation costs no DB work
+    sessions, players = response_cache.get_or_compute(
+        ('data_version',),
+        lambda: query_data_version((conn_factory or get_db)()),
+        counted=False
+    )
+    digest = zlib.crc32(repr(key).encode())
+    return f'{sessions}.{players}-{digest:08x}'
+
+def leaderboard_etag_key(period, limit):
+    """ETag key for a leaderboard; period boards roll over at midnight UTC without any write"""
+    day = time.strftime('%Y-%m-%d', time.gmtime()) if period != 'all' else None
+    return ('leaderboard', period, limit, day)
+
+def conditional_response(etag, build):
+    """Answer 304 if the client already has `etag`, else the built response"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate before reusing it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/')
 def index():
     """Serve the dashboard"""
@@ -83,58 +604,106 @@ def register_player():
         return jsonify({'error': 'Username is required'}), 400
     
     conn = get_db()
-    cursor = conn.cursor()
+    player_id, created = register_username(conn.cursor(), username)
+    if created:
+        conn.commit()
+        response_cache.invalidate()
+        leaderboard_feed.publish(conn)
     
+    return jsonify(registration_payload(player_id, username, created))
+
+def register_username(cursor, username):
+    """Insert a player, or find the existing one; returns (player_id, created)"""
     try:
         # Try to insert new player
         cursor.execute('INSERT INTO players (username) VALUES (?)', (username,))
-        conn.commit()
-        player_id = cursor.lastrowid
-        message = 'Player registered successfully'
+        return cursor.lastrowid, True
     except sqlite3.IntegrityError:
         # Player already exists, get their ID
         cursor.execute('SELECT id FROM players WHERE username = ?', (username,))
-        player_id = cursor.fetchone()[0]
-        message = 'Player already exists'
-    
-    conn.close()
-    
-    return jsonify({
+        return cursor.fetchone()[0], False
+
+def registration_payload(player_id, username, created):
+    return {
         'success': True,
         'player_id': player_id,
         'username': username,
-        'message': message
-    })
+        'message': 'Player registered successfully' if created else 'Player already exists'
+    }
 
-@app.route('/api/score/submit', methods=['POST'])
-def submit_score():
-    """Submit a game score"""
-    data = request.json
-    player_id = data.get('player_id')
-    score = data.get('score')
-    duration = data.get('duration', 0)
-    pipes_passed = data.get('pipes_passed', score)
-    
-    if not player_id or score is None:
-        return jsonify({'error': 'player_id and score are required'}), 400
-    
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Insert score
+def record_session(cursor, player_id, score, duration, pipes_passed):
+    """Insert one finished game and update the per-player and global totals"""
     cursor.execute(
         'INSERT INTO scores (player_id, score) VALUES (?, ?)',
         (player_id, score)
     )
     
-    # Insert game session
     cursor.execute(
         'INSERT INTO game_sessions (player_id, score, duration, pipes_passed) VALUES (?, ?, ?, ?)',
         (player_id, score, duration, pipes_passed)
     )
     
+    # Keep the per-player best score row current in the same transaction
+    cursor.execute('''
+        INSERT INTO player_best (player_id, best_score, games_played, total_score)
+        VALUES (?, ?, 1, ?)
+        ON CONFLICT (player_id) DO UPDATE SET
+            best_score = MAX(best_score, excluded.best_score),
+            games_played = games_played + 1,
+            total_score = total_score + excluded.total_score
+    ''', (player_id, score, score))
+    
+    cursor.execute('SELECT games_played FROM player_best WHERE player_id = ?', (player_id,))
+    first_game = cursor.fetchone()[0] == 1
+    
+    # And the global running totals; strict > keeps the first player to reach
+    # the highest score on top, like the old aggregate
+    cursor.execute('''
+        UPDATE global_stats SET
+            total_players = total_players + ?,
+            total_games = total_games + 1,
+            score_sum = score_sum + ?,
+            total_playtime = CASE WHEN ? IS NULL THEN total_playtime
+                                  ELSE COALESCE(total_playtime, 0) + ? END,
+            top_player_id = CASE WHEN highest_score IS NULL OR ? > highest_score
+                                 THEN ? ELSE top_player_id END,
+            highest_score = CASE WHEN highest_score IS NULL OR ? > highest_score
+                                 THEN ? ELSE highest_score END
+        WHERE id = 1
+    ''', (int(first_game), score, duration, duration, score, player_id, score, score))
+
+def parse_session(data):
+    """Validate one submitted game; returns (record_session args, error)"""
+    if not isinstance(data, dict):
+        return None, 'session must be an object'
+    player_id = data.get('player_id')
+    score = data.get('score')
+    if not player_id or score is None:
+        return None, 'player_id and score are required'
+    session = (player_id, score, data.get('duration', 0), data.get('pipes_passed', score))
+    # SQLite would store a string as text, and it would then outrank every
+    # number in the leaderboard and the global high score
+    for name, value in zip(('score', 'duration', 'pipes_passed'), session[1:]):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None, f'{name} must be a number'
+    return session, None
+
+@app.route('/api/score/submit', methods=['POST'])
+def submit_score():
+    """Submit a game score"""
+    session, error = parse_session(request.json)
+    if error:
+        return jsonify({'error': error}), 400
+    score = session[1]
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    record_session(cursor, *session)
+    
     conn.commit()
-    conn.close()
+    response_cache.invalidate()
+    leaderboard_feed.publish(conn)
     
     return jsonify({
         'success': True,
@@ -142,54 +711,215 @@ def submit_score():
         'score': score
     })
 
-@app.route('/api/leaderboard', methods=['GET'])
-def get_leaderboard():
-    """Get leaderboard data"""
-    limit = request.args.get('limit', 10, type=int)
-    period = request.args.get('period', 'all')  # all, today, week
+# Upper bound on sessions per batch, so one request can't hold the write lock for long
+MAX_BATCH_SIZE = 200
+
+@app.route('/api/score/submit_batch', methods=['POST'])
+def submit_score_batch():
+    """Submit several game scores in a single transaction"""
+    sessions, error = parse_batch(request.json)
+    if error:
+        return jsonify({'error': error}), 400
     
     conn = get_db()
     cursor = conn.cursor()
     
-    # Build query based on period
-    query = '''
-        SELECT 
-            p.username,
-            MAX(s.score) as best_score,
-            COUNT(s.id) as games_played,
-            AVG(s.score) as avg_score,
-            p.created_at as joined_date
-        FROM players p
-        LEFT JOIN scores s ON p.id = s.player_id
-    '''
-    
-    if period == 'today':
-        query += " WHERE DATE(s.created_at) = DATE('now') "
-    elif period == 'week':
-        query += " WHERE DATE(s.created_at) >= DATE('now', '-7 days') "
-    
-    query += '''
-        GROUP BY p.id
-        ORDER BY best_score DESC
-        LIMIT ?
-    '''
-    
-    cursor.execute(query, (limit,))
-    leaderboard = [dict(row) for row in cursor.fetchall()]
+    results = []
+    accepted = 0
+    for item in sessions:
+        session, error = parse_session(item)
+        if error:
+            results.append({'success': False, 'error': error})
+            continue
+        
+        record_session(cursor, *session)
+        results.append({'success': True, 'score': session[1]})
+        accepted += 1
+    
+    # One commit (and one fsync) for the whole batch
+    if accepted:
+        conn.commit()
+        response_cache.invalidate()
+        leaderboard_feed.publish(conn)
     
-    conn.close()
+    return jsonify(batch_payload(results))
+
+def parse_batch(data):
+    """Validate a batch request body; returns (sessions, error)"""
+    sessions = data.get('sessions') if isinstance(data, dict) else None
+    if not isinstance(sessions, list) or not sessions:
+        return None, 'sessions must be a non-empty list'
+    if len(sessions) > MAX_BATCH_SIZE:
+        return None, f'at most {MAX_BATCH_SIZE} sessions per batch'
+    return sessions, None
+
+def batch_payload(results):
+    accepted = sum(1 for result in results if result['success'])
+    return {
+        'success': True,
+        'accepted': accepted,
+        'rejected': len(results) - accepted,
+        'results': results
+    }
+
+def query_leaderboard(conn, period, limit):
+    """Build the leaderboard payload for a period"""
+    cursor = conn.cursor()
     
-    return jsonify({
+    if period in ('today', 'week'):
+        # Period boards still aggregate the raw scores in range. The filter
+        # compares created_at itself against a constant bound, so only the
+        # rows in range are read from idx_scores_created_at
+        if period == 'today':
+            since = "DATE('now')"
+        else:
+            since = "DATE('now', '-7 days')"
+        
+        cursor.execute(f'''
+            SELECT 
+                p.username,
+                MAX(s.score) as best_score,
+                COUNT(s.id) as games_played,
+                AVG(s.score) as avg_score,
+                p.created_at as joined_date
+            FROM scores s INDEXED BY idx_scores_created_at
+            JOIN players p ON p.id = s.player_id
+            WHERE s.created_at >= {since}
+            GROUP BY s.player_id
+            ORDER BY best_score DESC
+            LIMIT ?
+        ''', (limit,))
+        leaderboard = [dict(row) for row in cursor.fetchall()]
+    else:
+        # All-time board walks idx_player_best_score and stops after `limit` rows
+        cursor.execute('''
+            SELECT 
+                p.username,
+                b.best_score,
+                b.games_played,
+                CAST(b.total_score AS REAL) / b.games_played as avg_score,
+                p.created_at as joined_date
+            FROM player_best b
+            JOIN players p ON p.id = b.player_id
+            ORDER BY b.best_score DESC
+            LIMIT ? -- bounded scan: walks the index in order and stops at the limit
+        ''', (limit,))
+        leaderboard = [dict(row) for row in cursor.fetchall()]
+        
+        # Players without any score rank last, as they did with the LEFT JOIN
+        if limit < 0 or len(leaderboard) < limit:
+            cursor.execute('''
+                SELECT 
+                    p.username,
+                    NULL as best_score,
+                    0 as games_played,
+                    NULL as avg_score,
+                    p.created_at as joined_date
+                FROM players p
+                WHERE NOT EXISTS (SELECT 1 FROM player_best b WHERE b.player_id = p.id)
+                LIMIT ? -- bounded scan: stops once the board is full
+            ''', (limit - len(leaderboard) if limit >= 0 else -1,))
+            leaderboard += [dict(row) for row in cursor.fetchall()]
+    
+    return {
         'success': True,
         'leaderboard': leaderboard,
         'period': period,
         'total_players': len(leaderboard)
+    }
+
+@app.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """Get leaderboard data"""
+    limit = request.args.get('limit', 10, type=int)
+    period = request.args.get('period', 'all')  # all, today, week
+    
+    return conditional_response(
+        make_etag(*leaderboard_etag_key(period, limit)),
+        lambda: jsonify(response_cache.get_or_compute(
+            ('leaderboard', period, limit),
+            lambda: query_leaderboard(get_db(), period, limit)
+        ))
+    )
+
+def parse_since(value, epoch=None):
+    """Parse a client's last seen feed position: '<epoch>.<seq>' as SSE event
+    ids carry it, or a bare seq with its epoch passed separately"""
+    if value is None:
+        return None
+    value = str(value)
+    if '.' in value:
+        epoch, _, value = value.rpartition('.')
+    try:
+        return (epoch, int(value))
+    except ValueError:
+        return None
+
+def feed_event(message):
+    """One SSE event carrying a feed message, with its position as the event id"""
+    return f"id: {message['epoch']}.{message['seq']}\nevent: leaderboard\ndata: {json.dumps(message)}\n\n"
+
+@app.route('/api/leaderboard/stream', methods=['GET'])
+def stream_leaderboard():
+    """Server-Sent Events stream of all-time top-N leaderboard changes"""
+    if not FEED_PUSH:
+        # EventSource gives up on a 204 instead of reconnecting
+        return Response(status=204)
+    leaderboard_feed.ensure_loaded()
+    # EventSource sends Last-Event-ID when it reconnects
+    since = parse_since(request.headers.get('Last-Event-ID', request.args.get('since')))
+    
+    def generate():
+        position = since
+        # Bounded, so one open page never holds a worker for good
+        deadline = time.monotonic() + FEED_STREAM_SECONDS
+        yield f'retry: {FEED_RETRY_MS}\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            message = leaderboard_feed.wait(position, min(FEED_KEEPALIVE, remaining))
+            if message is None:
+                yield ': keepalive\n\n'
+                continue
+            position = (message['epoch'], message['seq'])
+            yield feed_event(message)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
+@app.route('/api/leaderboard/poll', methods=['GET'])
+def poll_leaderboard():
+    """Long-poll for the next all-time top-N leaderboard change"""
+    leaderboard_feed.ensure_loaded()
+    since = parse_since(request.args.get('since'), request.args.get('epoch'))
+    timeout = min(max(request.args.get('timeout', 25, type=float), 0), FEED_MAX_WAIT)
+    if not FEED_PUSH:
+        # Answer at once; the clients then poll at their own pace
+        leaderboard_feed.resync_if_due()
+        timeout = 0
+    
+    message = leaderboard_feed.wait(since, timeout)
+    if message is None:
+        message = {'type': 'none', 'epoch': since[0], 'seq': since[1]}
+    message['success'] = True
+    return jsonify(message)
+
 @app.route('/api/player/<int:player_id>/stats', methods=['GET'])
 def get_player_stats(player_id):
     """Get detailed stats for a specific player"""
-    conn = get_db()
+    def build():
+        payload = query_player_stats(get_db(), player_id)
+        if payload is None:
+            return jsonify({'error': 'Player not found'}), 404
+        return jsonify(payload)
+    
+    return conditional_response(make_etag('player_stats', player_id), build)
+
+def query_player_stats(conn, player_id):
+    """Build the stats payload for one player, or None if there is no such player"""
     cursor = conn.cursor()
     
     # Get player info
@@ -197,8 +927,7 @@ def get_player_stats(player_id):
     player = cursor.fetchone()
     
     if not player:
-        conn.close()
-        return jsonify({'error': 'Player not found'}), 404
+        return None
     
     # Get stats
     cursor.execute('''
@@ -225,52 +954,60 @@ def get_player_stats(player_id):
     
     recent_games = [dict(row) for row in cursor.fetchall()]
     
-    conn.close()
-    
-    return jsonify({
+    return {
         'success': True,
         'player': dict(player),
         'stats': stats,
         'recent_games': recent_games
-    })
+    }
 
-@app.route('/api/stats/global', methods=['GET'])
-def get_global_stats():
-    """Get global game statistics"""
-    conn = get_db()
+def query_global_stats(conn):
+    """Build the global statistics payload"""
     cursor = conn.cursor()
     
+    # A primary-key read of the running totals, whatever the history size.
+    # The top player's name is a subquery rather than a join: once ANALYZE
+    # has counted the single global_stats row, SQLite plans the join as a
+    # scan of it, while this form stays two primary-key searches
     cursor.execute('''
         SELECT 
-            COUNT(DISTINCT player_id) as total_players,
-            COUNT(*) as total_games,
-            MAX(score) as highest_score,
-            AVG(score) as avg_score,
-            SUM(duration) as total_playtime
-        FROM game_sessions
+            g.total_players,
+            g.total_games,
+            g.highest_score,
+            CAST(g.score_sum AS REAL) / NULLIF(g.total_games, 0) as avg_score,
+            g.total_playtime,
+            (SELECT p.username FROM players p WHERE p.id = g.top_player_id) as top_username
+        FROM global_stats g
+        WHERE g.id = 1
     ''')
     
     stats = dict(cursor.fetchone())
+    top_username = stats.pop('top_username')
+    if top_username is not None:
+        stats['top_player'] = {'username': top_username, 'score': stats['highest_score']}
     
-    # Get top scorer
-    cursor.execute('''
-        SELECT p.username, MAX(s.score) as score
-        FROM players p
-        JOIN scores s ON p.id = s.player_id
-        GROUP BY p.id
-        ORDER BY score DESC
-        LIMIT 1
-    ''')
-    
-    top_player = cursor.fetchone()
-    if top_player:
-        stats['top_player'] = dict(top_player)
-    
-    conn.close()
-    
-    return jsonify({
+    return {
         'success': True,
         'stats': stats
+    }
+
+@app.route('/api/stats/global', methods=['GET'])
+def get_global_stats():
+    """Get global game statistics"""
+    return conditional_response(
+        make_etag('global_stats'),
+        lambda: jsonify(response_cache.get_or_compute(
+            ('global_stats',),
+            lambda: query_global_stats(get_db())
+        ))
+    )
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get response cache hit/miss counters"""
+    return jsonify({
+        'success': True,
+        'cache': response_cache.stats()
     })
 
 if __name__ == '__main__':
@@ -0,0 +1,441 @@
+"""Asynchronous (ASGI) serving mode for the Flappy Bird API.
+
+    python asgi.py                          # or: uvicorn asgi:application --port 5000
+
+Serves the same /api/* endpoints and JSON as app.py, plus the two pages,
+reusing its queries, caches and leaderboard feed. Reads run concurrently on
+read-only connections. Every write goes through one queue drained by a
+single writer task, which commits whatever has piled up as one transaction,
+so writes never contend for the SQLite lock and a burst of submissions costs
+one commit. The queue is per process: run a single worker.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from flask import render_template
+
+import app as api
+
+# Most writes one transaction may group together
+MAX_WRITE_GROUP = 256
+
+# ============= READ PATH =============
+
+_read_executor = ThreadPoolExecutor(max_workers=api.DB_POOL_SIZE, thread_name_prefix='db-read')
+_read_local = threading.local()
+
+def read_conn():
+    """This read thread's own read-only connection"""
+    conn = getattr(_read_local, 'conn', None)
+    if conn is None:
+        conn = _read_local.conn = api.connect_db(readonly=True)
+    return conn
+
+async def run_read(query, *args):
+    """Run query(conn, *args) on a read-only connection off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_read_executor, lambda: query(read_conn(), *args))
+
+async def make_etag(*key):
+    return await run_read(lambda conn: api.make_etag(*key, conn_factory=lambda: conn))
+
+# ============= WRITE PATH =============
+
+def write_register(cursor, username):
+    player_id, created = api.register_username(cursor, username)
+    return api.registration_payload(player_id, username, created), created
+
+def write_session(cursor, session):
+    api.record_session(cursor, *session)
+    return {
+        'success': True,
+        'message': 'Score submitted successfully',
+        'score': session[1]
+    }, True
+
+def write_batch(cursor, sessions):
+    results = []
+    for item in sessions:
+        session, error = api.parse_session(item)
+        if error:
+            results.append({'success': False, 'error': error})
+            continue
+        api.record_session(cursor, *session)
+        results.append({'success': True, 'score': session[1]})
+    payload = api.batch_payload(results)
+    return payload, payload['accepted'] > 0
+
+class WriteQueue:
+    """Single writer: queued write operations are applied in groups, one commit per group.
+
+    Each operation is a function (cursor, *args) -> (payload, wrote). It runs
+    inside a savepoint, so one failing request doesn't undo the others in its
+    group.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-write')
+        self._conn = None
+        self._queue = None
+        self._task = None
+        self.feed_changed = None
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self.feed_changed = asyncio.Condition()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, operation, *args):
+        """Queue a write and wait for its group to commit"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, args, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            group = [await self._queue.get()]
+            while len(group) < MAX_WRITE_GROUP and not self._queue.empty():
+                group.append(self._queue.get_nowait())
+
+            try:
+                outcomes = await loop.run_in_executor(self._executor, self._apply, group)
+            except Exception as exc:
+                outcomes = [(None, exc)] * len(group)
+
+            for (_, _, future), (payload, error) in zip(group, outcomes):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(payload)
+
+            async with self.feed_changed:
+                self.feed_changed.notify_all()
+
+    def _apply(self, group):
+        if self._conn is None:
+            self._conn = api.connect_db()
+        conn = self._conn
+        cursor = conn.cursor()
+
+        outcomes = []
+        wrote = False
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for operation, args, _ in group:
+                cursor.execute('SAVEPOINT op')
+                try:
+                    payload, changed = operation(cursor, *args)
+                    cursor.execute('RELEASE op')
+                    outcomes.append((payload, None))
+                    wrote = wrote or changed
+                except Exception as exc:
+                    cursor.execute('ROLLBACK TO op')
+                    cursor.execute('RELEASE op')
+                    outcomes.append((None, exc))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        if wrote:
+            api.response_cache.invalidate()
+            api.leaderboard_feed.publish(conn)
+        return outcomes
+
+writer = WriteQueue()
+
+async def wait_for_feed(since, timeout):
+    """Next leaderboard feed message after `since`, or None on timeout"""
+    message = api.leaderboard_feed.wait(since, 0)
+    if message is not None:
+        return message
+    writer._ensure_started()
+    try:
+        async with writer.feed_changed:
+            await asyncio.wait_for(
+                writer.feed_changed.wait_for(lambda: api.leaderboard_feed.position != since),
+                timeout
+            )
+    except asyncio.TimeoutError:
+        return None
+    return api.leaderboard_feed.wait(since, 0)
+
+# ============= HTTP PLUMBING =============
+
+class Request:
+    def __init__(self, scope, receive, params):
+        self.scope = scope
+        self.receive = receive
+        self.params = params
+        self.method = scope['method']
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+        self.args = {k: v[0] for k, v in parse_qs(scope['query_string'].decode('latin-1')).items()}
+
+    def arg(self, name, default, type=str):
+        """Query parameter with Flask's request.args.get(name, default, type) semantics"""
+        try:
+            return type(self.args[name])
+        except (KeyError, ValueError):
+            return default
+
+    async def json(self):
+        body = b''
+        while True:
+            message = await self.receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    def if_none_match(self, etag):
+        header = self.headers.get('if-none-match')
+        if not header:
+            return False
+        tags = [tag.strip().removeprefix('W/').strip('"') for tag in header.split(',')]
+        return '*' in tags or etag in tags
+
+class JSONResponse:
+    def __init__(self, payload, status=200, headers=None):
+        self.body = json.dumps(payload).encode()
+        self.status = status
+        self.headers = dict(headers or {}, **{'content-type': 'application/json'})
+
+class RawResponse:
+    def __init__(self, body=b'', status=200, headers=None):
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+
+class StreamResponse:
+    """Body produced chunk by chunk from an async iterator of str"""
+    def __init__(self, chunks, headers):
+        self.chunks = chunks
+        self.status = 200
+        self.headers = headers
+
+CORS_HEADERS = {
+    'access-control-allow-origin': '*',
+}
+
+async def send_response(send, response):
+    headers = dict(CORS_HEADERS, **response.headers)
+    await send({
+        'type': 'http.response.start',
+        'status': response.status,
+        'headers': [(k.encode(), v.encode()) for k, v in headers.items()],
+    })
+    if isinstance(response, StreamResponse):
+        async for chunk in response.chunks:
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    else:
+        await send({'type': 'http.response.body', 'body': response.body})
+
+async def conditional(request, etag, build):
+    """Async counterpart of app.conditional_response"""
+    if request.if_none_match(etag):
+        response = RawResponse(status=304)
+    else:
+        response = await build()
+        if response.status != 200:
+            return response
+    response.headers['etag'] = f'"{etag}"'
+    response.headers['cache-control'] = 'no-cache'
+    return response
+
+# ============= ROUTES =============
+
+async def register_player(request):
+    data = await request.json()
+    username = data.get('username', '').strip() if isinstance(data, dict) else ''
+    if not username:
+        return JSONResponse({'error': 'Username is required'}, 400)
+    return JSONResponse(await writer.submit(write_register, username))
+
+async def submit_score(request):
+    session, error = api.parse_session(await request.json())
+    if error:
+        return JSONResponse({'error': error}, 400)
+    return JSONResponse(await writer.submit(write_session, session))
+
+async def submit_score_batch(request):
+    sessions, error = api.parse_batch(await request.json())
+    if error:
+        return JSONResponse({'error': error}, 400)
+    return JSONResponse(await writer.submit(write_batch, sessions))
+
+async def get_leaderboard(request):
+    limit = request.arg('limit', 10, int)
+    period = request.arg('period', 'all')
+
+    async def build():
+        return JSONResponse(await run_read(lambda conn: api.response_cache.get_or_compute(
+            ('leaderboard', period, limit),
+            lambda: api.query_leaderboard(conn, period, limit)
+        )))
+
+    return await conditional(request, await make_etag(*api.leaderboard_etag_key(period, limit)), build)
+
+async def get_player_stats(request):
+    player_id = int(request.params['player_id'])
+
+    async def build():
+        payload = await run_read(api.query_player_stats, player_id)
+        if payload is None:
+            return JSONResponse({'error': 'Player not found'}, 404)
+        return JSONResponse(payload)
+
+    return await conditional(request, await make_etag('player_stats', player_id), build)
+
+async def get_global_stats(request):
+    async def build():
+        return JSONResponse(await run_read(lambda conn: api.response_cache.get_or_compute(
+            ('global_stats',),
+            lambda: api.query_global_stats(conn)
+        )))
+
+    return await conditional(request, await make_etag('global_stats'), build)
+
+async def get_cache_stats(request):
+    return JSONResponse({
+        'success': True,
+        'cache': api.response_cache.stats()
+    })
+
+async def poll_leaderboard(request):
+    await run_read(lambda conn: api.leaderboard_feed.ensure_loaded())
+    since = api.parse_since(request.args.get('since'), request.args.get('epoch'))
+    timeout = min(max(request.arg('timeout', 25, float), 0), api.FEED_MAX_WAIT)
+    if not api.FEED_PUSH:
+        await run_read(lambda conn: api.leaderboard_feed.resync_if_due())
+        timeout = 0
+
+    message = await wait_for_feed(since, timeout)
+    if message is None:
+        message = {'type': 'none', 'epoch': since[0], 'seq': since[1]}
+    message['success'] = True
+    return JSONResponse(message)
+
+async def stream_leaderboard(request):
+    """Server-Sent Events; streams until the client disconnects or
+    FEED_STREAM_SECONDS pass, like app.stream_leaderboard"""
+    if not api.FEED_PUSH:
+        return RawResponse(status=204)
+    await run_read(lambda conn: api.leaderboard_feed.ensure_loaded())
+    since = api.parse_since(request.headers.get('last-event-id', request.args.get('since')))
+
+    async def wait_for_disconnect():
+        while (await request.receive())['type'] != 'http.disconnect':
+            pass
+
+    async def generate():
+        position = since
+        disconnected = asyncio.ensure_future(wait_for_disconnect())
+        deadline = time.monotonic() + api.FEED_STREAM_SECONDS
+        try:
+            yield f'retry: {api.FEED_RETRY_MS}\n\n'
+            while not disconnected.done():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                message = await wait_for_feed(position, min(api.FEED_KEEPALIVE, remaining))
+                if message is None:
+                    yield ': keepalive\n\n'
+                    continue
+                position = (message['epoch'], message['seq'])
+                yield api.feed_event(message)
+        finally:
+            disconnected.cancel()
+
+    return StreamResponse(generate(), headers={
+        'content-type': 'text/event-stream; charset=utf-8',
+        'cache-control': 'no-cache',
+        'x-accel-buffering': 'no',
+    })
+
+_pages = {}
+
+async def page(request):
+    template = request.params['template']
+    if template not in _pages:
+        with api.app.app_context():
+            _pages[template] = render_template(template).encode()
+    return RawResponse(_pages[template], headers={'content-type': 'text/html; charset=utf-8'})
+
+ROUTES = [
+    (r'/', 'GET', page, {'template': 'dashboard.html'}),
+    (r'/leaderboard', 'GET', page, {'template': 'leaderboard.html'}),
+    (r'/api/player/register', 'POST', register_player, {}),
+    (r'/api/score/submit', 'POST', submit_score, {}),
+    (r'/api/score/submit_batch', 'POST', submit_score_batch, {}),
+    (r'/api/leaderboard', 'GET', get_leaderboard, {}),
+    (r'/api/leaderboard/poll', 'GET', poll_leaderboard, {}),
+    (r'/api/leaderboard/stream', 'GET', stream_leaderboard, {}),
+    (r'/api/player/(?P<player_id>\d+)/stats', 'GET', get_player_stats, {}),
+    (r'/api/stats/global', 'GET', get_global_stats, {}),
+    (r'/api/cache/stats', 'GET', get_cache_stats, {}),
+]
+ROUTES = [(re.compile(pattern), method, handler, defaults) for pattern, method, handler, defaults in ROUTES]
+
+async def application(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    path = scope['path']
+    allowed = []
+    for pattern, method, handler, defaults in ROUTES:
+        match = pattern.fullmatch(path)
+        if not match:
+            continue
+        allowed.append(method)
+        if scope['method'] != method:
+            continue
+        request = Request(scope, receive, dict(defaults, **match.groupdict()))
+        await send_response(send, await handler(request))
+        return
+
+    if allowed and scope['method'] == 'OPTIONS':
+        # CORS preflight, as flask-cors answers it
+        await send_response(send, RawResponse(headers={
+            'access-control-allow-methods': ', '.join(allowed + ['OPTIONS']),
+            'access-control-allow-headers': 'Content-Type',
+        }))
+    elif allowed:
+        await send_response(send, JSONResponse({'error': 'Method not allowed'}, 405))
+    else:
+        await send_response(send, JSONResponse({'error': 'Not found'}, 404))
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Async mode needs uvicorn: pip install uvicorn")
+
+    print("Flappy Bird Multiplayer Server Starting (async mode)...")
+    print("Dashboard: http://localhost:5000")
+    print("Leaderboard: http://localhost:5000/leaderboard")
+    print("API: http://localhost:5000/api/")
+    # One process only: the single-writer queue lives in this process
+    uvicorn.run(application, host='0.0.0.0', port=5000, workers=1)
@@ -0,0 +1,277 @@
+"""Load-test harness for the Flask API in app.py.
+
+    python benchmark.py seed --players 100000 --sessions 10000000
+    python benchmark.py run --clients 32 --duration 30
+
+`seed` fills a database (benchmark.db by default, never the live one) with
+synthetic players and game sessions spread over the last few weeks. `run`
+starts the server against that database in a separate process (`flask run`,
+or asgi.py under uvicorn with --server asgi), drives the API from many
+concurrent clients with a weighted read/write mix, and prints throughput and
+p50/p95/p99 latency per endpoint. Pass --url to aim it at a server that is
+already running instead.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(BASE_DIR, 'benchmark.db')
+
+# Relative weight of each operation in the request mix
+DEFAULT_MIX = {
+    'submit': 10,
+    'leaderboard_all': 40,
+    'leaderboard_today': 10,
+    'leaderboard_week': 10,
+    'player_stats': 15,
+    'global_stats': 15,
+}
+
+SEED_BATCH = 50000
+
+# ============= SEEDING =============
+
+def open_app_db(db_path):
+    """Create or migrate the database through app.py, then open it for bulk loading"""
+    os.environ['FLAPPYBIRD_DB'] = db_path
+    import app  # noqa: F401 - importing runs init_db() against FLAPPYBIRD_DB
+    conn = sqlite3.connect(db_path)
+    # Throwaway data: trade durability for load speed
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -200000')
+    return conn, app
+
+def random_timestamps(count, days):
+    """Yield `created_at` strings spread uniformly over the last `days` days"""
+    now = datetime.utcnow()
+    span = days * 86400
+    for _ in range(count):
+        yield (now - timedelta(seconds=random.uniform(0, span))).strftime('%Y-%m-%d %H:%M:%S')
+
+def seed(db_path, players, sessions, days):
+    """Bulk-load synthetic players and sessions"""
+    conn, app = open_app_db(db_path)
+    first_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM players').fetchone()[0] + 1
+
+    started = time.perf_counter()
+    conn.executemany(
+        'INSERT INTO players (username, created_at) VALUES (?, ?)',
+        ((f'BENCH{first_id + n}', ts) for n, ts in enumerate(random_timestamps(players, days)))
+    )
+    conn.commit()
+    print(f"players:  {players:>10,} in {time.perf_counter() - started:.1f}s")
+
+    last_id = first_id + players - 1
+    started = time.perf_counter()
+    done = 0
+    while done < sessions:
+        batch = []
+        for ts in random_timestamps(min(SEED_BATCH, sessions - done), days):
+            # Skewed scores: most games end early, a few go long
+            score = int(random.expovariate(1 / 12))
+            batch.append((random.randint(first_id, last_id), score, score * 2.1 + random.uniform(1, 4), ts))
+        conn.executemany(
+            'INSERT INTO scores (player_id, score, created_at) VALUES (?, ?, ?)',
+            ((pid, score, ts) for pid, score, _, ts in batch)
+        )
+        conn.executemany(
+            'INSERT INTO game_sessions (player_id, score, duration, pipes_passed, created_at) VALUES (?, ?, ?, ?, ?)',
+            ((pid, score, dur, score, ts) for pid, score, dur, ts in batch)
+        )
+        conn.commit()
+        done += len(batch)
+        print(f"\rsessions: {done:>10,} in {time.perf_counter() - started:.1f}s", end='', flush=True)
+    print()
+
+    # Derived tables are rebuilt from the raw rows, exactly as the CLI commands do
+    started = time.perf_counter()
+    app.backfill_player_best(conn)
+    app.rebuild_global_stats(conn)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    print(f"derived tables rebuilt in {time.perf_counter() - started:.1f}s")
+
+# ============= LOAD GENERATION =============
+
+class Recorder:
+    """Per-operation latency samples and error counts, shared by all clients"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, op, seconds, ok):
+        with self.lock:
+            if ok:
+                self.latencies.setdefault(op, []).append(seconds)
+            else:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def client_loop(base_url, mix, player_ids, deadline, recorder, seed_value):
+    """One simulated client: issue weighted random requests until the deadline"""
+    rng = random.Random(seed_value)
+    ops, weights = zip(*mix.items())
+    session = requests.Session()
+
+    while time.perf_counter() < deadline:
+        op = rng.choices(ops, weights)[0]
+        player_id = rng.randint(*player_ids)
+        if op == 'submit':
+            score = int(rng.expovariate(1 / 12))
+            call = lambda: session.post(f'{base_url}/score/submit', json={
+                'player_id': player_id, 'score': score, 'duration': score * 2.1
+            }, timeout=30)
+        elif op.startswith('leaderboard_'):
+            period = op.split('_', 1)[1]
+            call = lambda: session.get(f'{base_url}/leaderboard', params={'limit': 10, 'period': period}, timeout=30)
+        elif op == 'player_stats':
+            call = lambda: session.get(f'{base_url}/player/{player_id}/stats', timeout=30)
+        else:
+            call = lambda: session.get(f'{base_url}/stats/global', timeout=30)
+
+        started = time.perf_counter()
+        try:
+            ok = call().status_code == 200
+        except requests.RequestException:
+            ok = False
+        recorder.record(op, time.perf_counter() - started, ok)
+
+SERVER_COMMANDS = {
+    'flask': ['-m', 'flask', '--app', 'app', 'run', '--no-reload', '--port'],
+    'asgi': ['-m', 'uvicorn', 'asgi:application', '--log-level', 'warning', '--port'],
+}
+
+def start_server(db_path, port, mode='flask'):
+    """Run the app in its own process so it doesn't share our GIL"""
+    env = dict(os.environ, FLAPPYBIRD_DB=db_path)
+    server = subprocess.Popen(
+        [sys.executable] + SERVER_COMMANDS[mode] + [str(port)],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}/api'
+    for _ in range(100):
+        try:
+            requests.get(f'{base_url}/cache/stats', timeout=1)
+            return server, base_url
+        except requests.RequestException:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit('server did not start')
+
+def report(recorder, elapsed):
+    """Print a per-operation summary and return it as a dict"""
+    summary = {}
+    print(f"{'operation':<20}{'count':>8}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    total = 0
+    for op in sorted(set(recorder.latencies) | set(recorder.errors)):
+        samples = sorted(recorder.latencies.get(op, []))
+        errors = recorder.errors.get(op, 0)
+        total += len(samples)
+        row = {
+            'count': len(samples),
+            'errors': errors,
+            'rps': len(samples) / elapsed,
+            'p50_ms': percentile(samples, 0.50) * 1000,
+            'p95_ms': percentile(samples, 0.95) * 1000,
+            'p99_ms': percentile(samples, 0.99) * 1000,
+        }
+        summary[op] = row
+        print(f"{op:<20}{row['count']:>8}{errors:>6}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+    print(f"{'total':<20}{total:>8}{sum(recorder.errors.values()):>6}{total / elapsed:>9.1f}")
+    summary['total_rps'] = total / elapsed
+    return summary
+
+def run(args):
+    """Drive the API and report latency percentiles"""
+    mix = dict(DEFAULT_MIX)
+    for item in args.mix or []:
+        op, _, weight = item.partition('=')
+        if op not in mix:
+            raise SystemExit(f"unknown operation {op!r}; choose from {', '.join(mix)}")
+        mix[op] = float(weight)
+    mix = {op: weight for op, weight in mix.items() if weight > 0}
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        player_ids = (1, args.max_player_id or 1)
+    else:
+        conn = sqlite3.connect(args.db)
+        low, high = conn.execute('SELECT MIN(id), MAX(id) FROM players').fetchone()
+        conn.close()
+        if low is None:
+            raise SystemExit(f"{args.db} has no players; run `benchmark.py seed` first")
+        player_ids = (low, high)
+        server, base_url = start_server(args.db, args.port, args.server)
+
+    try:
+        recorder = Recorder()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        clients = [
+            threading.Thread(target=client_loop, args=(base_url, mix, player_ids, deadline, recorder, n), daemon=True)
+            for n in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        summary = report(recorder, time.perf_counter() - started)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'server': args.server, 'clients': args.clients, 'duration': args.duration, 'mix': mix, 'results': summary}, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed and load-test the Flappy Bird API')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='bulk-load synthetic players and sessions')
+    seed_parser.add_argument('--db', default=DEFAULT_DB)
+    seed_parser.add_argument('--players', type=int, default=10000)
+    seed_parser.add_argument('--sessions', type=int, default=200000)
+    seed_parser.add_argument('--days', type=int, default=30, help='spread created_at over this many days')
+
+    run_parser = commands.add_parser('run', help='drive the API and report latency percentiles')
+    run_parser.add_argument('--db', default=DEFAULT_DB)
+    run_parser.add_argument('--url', help='target an already running server, e.g. http://localhost:5000/api')
+    run_parser.add_argument('--max-player-id', type=int, help='highest player id to use with --url')
+    run_parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='flask',
+                            help='flask: threaded WSGI app.py; asgi: async asgi.py with the single-writer queue')
+    run_parser.add_argument('--port', type=int, default=5055)
+    run_parser.add_argument('--clients', type=int, default=16)
+    run_parser.add_argument('--duration', type=float, default=20.0, help='seconds')
+    run_parser.add_argument('--mix', nargs='*', metavar='OP=WEIGHT', help=f"override weights of: {', '.join(DEFAULT_MIX)}")
+    run_parser.add_argument('--json', metavar='PATH', help='also write the results as JSON, for comparing runs')
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed(args.db, args.players, args.sessions, args.days)
+    else:
+        run(args)
+
+if __name__ == '__main__':
+    main()
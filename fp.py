@@ -1,13 +1,19 @@
 import pygame
 import sys
 import random
-import cv2
-import mediapipe as mp
 import math
 import requests
 import time
 import threading
 import os
+import multiprocessing
+from datetime import datetime
+
+from apiclient import ScoreBatcher, follow_leaderboard
+from gesture import (CameraCapture, GestureThread, InferenceProcess, LatencyTracker, PinchDetector, ReplayCapture,
+                     SessionRecorder, inference_summary, make_backend)
+from effects import ParticleSystem, Starfield
+from textcache import TextCache
 
 # --- Performance Optimization for EXE ---
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3' # Suppress heavy logging
@@ -21,15 +27,59 @@ if getattr(sys, 'frozen', False):
 else:
     base_path = os.path.dirname(os.path.abspath(__file__))
 
+# The EXE relaunches itself as the gesture worker process (GESTURE_PROCESS)
+multiprocessing.freeze_support()
+
 # --- Configuration ---
 # Set this to your live URL once deployed (e.g., "https://yourname.pythonanywhere.com/api")
 PRODUCTION_URL = "https://Shalcoder1.pythonanywhere.com/api" 
 LOCAL_URL = "http://localhost:5000/api"
 API_URL = PRODUCTION_URL if PRODUCTION_URL else LOCAL_URL
 
-# --- Pygame Setup ---
-pygame.init()
+# Hand detector: "mediapipe" (landmarks, accurate), "skin" (classical skin-mask
+# pinch detector for kiosks too slow for MediaPipe) or "replay" (hand readings
+# of a recorded session, see below). AEROGESTURE_BACKEND overrides it.
+GESTURE_BACKEND = os.environ.get('AEROGESTURE_BACKEND', 'mediapipe')
+
+# Run capture and hand detection in a worker process instead of a thread, so
+# inference spikes can't hold the GIL the game loop needs (frames are shared
+# through shared memory, not copied). Pays off on multi-core machines; set
+# AEROGESTURE_PROCESS=1 to turn it on.
+GESTURE_PROCESS = os.environ.get('AEROGESTURE_PROCESS') == '1'
+
+# Region-of-interest tracking (MediaPipe only): once a hand is found, run
+# MediaPipe on a padded crop around it and fall back to the full frame when it
+# is lost. Average inference time per mode is printed on exit to compare the two.
+ROI_TRACKING = False
+ROI_PAD = 0.5        # padding on each side, as a fraction of the hand's size
+ROI_MIN_SIZE = 96    # smallest crop edge in pixels
+
+# Pinch smoothing: "ema" (fixed exponential average), "one_euro" (adaptive,
+# less lag on fast pinches) or "predictive" (One Euro plus triggering on the
+# extrapolated distance ~20 ms ahead). AEROGESTURE_FILTER overrides it.
+PINCH_FILTER = os.environ.get('AEROGESTURE_FILTER', 'ema')
+
+# Detection rate governor (hand detections per second). The gesture thread runs
+# at DETECT_FPS while playing, speeds up while fingers are closing, idles on the
+# menus, and scales down when the game loop misses its frame budget.
+GAME_FPS = 90
+DETECT_FPS = 30
+DETECT_FPS_PINCH = 60
+DETECT_FPS_IDLE = 10
+DETECT_FPS_MIN = 8
+
+# Camera-to-flap latency: F2 shows the histograms under the camera preview,
+# F3 writes every recorded flap to this CSV (next to the script or EXE)
+LATENCY_CSV = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), 'gesture_latency.csv')
+
+# F4 records the camera and hand readings to RECORDINGS_DIR. Setting
+# AEROGESTURE_REPLAY to a recording (path without extension) or any video file
+# plays it back, looped, in place of the camera; the "replay" backend then
+# also replays its recorded readings instead of detecting.
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), 'recordings')
+REPLAY = os.environ.get('AEROGESTURE_REPLAY')
 
+# --- Pygame Setup ---
 # LAPTOP OPTIMIZED LAYOUT
 CAMERA_WIDTH = 320
 CAMERA_HEIGHT = 240
@@ -39,14 +89,21 @@ LEADERBOARD_WIDTH = 300
 SCREEN_WIDTH = CAMERA_WIDTH + GAME_WIDTH + LEADERBOARD_WIDTH
 SCREEN_HEIGHT = GAME_HEIGHT
 
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("AeroGesture - Vision Controlled Flight")
-clock = pygame.time.Clock()
+# The spawned gesture worker imports this module (InferenceProcess); only the
+# game itself opens the window
+if __name__ == '__main__':
+    pygame.init()
+
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("AeroGesture - Vision Controlled Flight")
+    clock = pygame.time.Clock()
 
-# Fonts
-title_font = pygame.font.Font(None, 60)
-game_font = pygame.font.Font(None, 40)
-small_font = pygame.font.Font(None, 24)
+    # Fonts
+    title_font = pygame.font.Font(None, 60)
+    game_font = pygame.font.Font(None, 40)
+    small_font = pygame.font.Font(None, 24)
+    # HUD, overlay and leaderboard text repeats frame after frame; render each once
+    text_cache = TextCache()
 
 # --- Colors ---
 BG_DARK = (10, 10, 25)
@@ -73,152 +130,286 @@ USERNAME = ""
 PLAYER_ID = None
 START_TIME = 0
 LEADERBOARD_DATA = []
-LAST_LEADERBOARD_UPDATE = 0
 
 # --- Threaded Gesture Controller ---
+class RateGovernor:
+    """Chooses how often the gesture thread runs detection.
+
+    The main loop reports each frame's work time and the game state; the
+    gesture thread asks for the interval until its next detection. Missed
+    frame budgets cut the rate multiplicatively, met ones restore it slowly.
+    Fields are plain floats written by one thread each, so no lock is needed.
+    """
+    BACKOFF = 0.8
+    RECOVER = 0.005
+    MIN_SCALE = 0.25
+
+    def __init__(self):
+        self.budget = 1.0 / GAME_FPS
+        self.scale = 1.0
+        self.idle = True
+        self.rate = DETECT_FPS_IDLE
+
+        # Smoothed loop times (seconds) and totals for the exit summary
+        self.main_time = 0.0
+        self.gesture_time = 0.0
+        self.main_frames = 0
+        self.main_missed = 0
+        self.time_in = {'idle': 0.0, 'play': 0.0, 'pinch': 0.0, 'backoff': 0.0}
+
+    def main_frame(self, seconds, state):
+        """Called once per game frame with the time spent working (excluding the tick delay)"""
+        self.main_time += (seconds - self.main_time) * 0.1
+        self.main_frames += 1
+        self.idle = state != "PLAYING"
+        if seconds > self.budget:
+            self.main_missed += 1
+            self.scale = max(self.MIN_SCALE, self.scale * self.BACKOFF)
+        else:
+            self.scale = min(1.0, self.scale + self.RECOVER)
+
+    def next_interval(self, work_seconds, pinching):
+        """Called by the gesture thread after each detection; returns seconds to wait"""
+        self.gesture_time += (work_seconds - self.gesture_time) * 0.1
+        if pinching:
+            rate, mode = DETECT_FPS_PINCH, 'pinch'
+        elif self.idle:
+            rate, mode = DETECT_FPS_IDLE, 'idle'
+        else:
+            rate, mode = DETECT_FPS, 'play'
+        if self.scale < 1.0:
+            rate, mode = max(DETECT_FPS_MIN, rate * self.scale), 'backoff'
+        self.rate = rate
+        interval = 1.0 / rate
+        self.time_in[mode] += max(interval, work_seconds)
+        return max(0.002, interval - work_seconds)
+
+    def loop_times(self):
+        """Smoothed main and gesture loop times in ms, plus the current detection rate"""
+        return {
+            'main_ms': self.main_time * 1000,
+            'gesture_ms': self.gesture_time * 1000,
+            'detect_hz': self.rate,
+            'scale': self.scale,
+        }
+
+    def summary(self):
+        total = sum(self.time_in.values()) or 1.0
+        shares = ', '.join(f"{mode} {seconds / total:.0%}" for mode, seconds in self.time_in.items())
+        missed = self.main_missed / max(self.main_frames, 1)
+        return (f"Game loop: {self.main_time * 1000:.1f} ms/frame, {missed:.1%} over budget; "
+                f"gesture loop: {self.gesture_time * 1000:.1f} ms/detection; time at rate: {shares}")
+
 class GestureController:
+    # Overlay line colour and width per pinch zone
+    ZONE_STYLE = {'pinch': ((0, 255, 0), 4), 'open': ((255, 255, 0), 2), 'between': ((0, 0, 255), 2)}
+
     def __init__(self):
-        # Using 0 for first camera, try to be robust
-        self.cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        if not self.cap.isOpened():
-            self.cap = cv2.VideoCapture(0)
-            
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
-        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            max_num_hands=1, 
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-            model_complexity=0 
-        )
+        video = None
+        if REPLAY:
+            video = REPLAY if os.path.splitext(REPLAY)[1] else REPLAY + '.avi'
+            if not os.path.exists(video): video = None
+        options = {}
+        if GESTURE_BACKEND == 'mediapipe':
+            options = dict(roi_tracking=ROI_TRACKING, roi_pad=ROI_PAD, roi_min_size=ROI_MIN_SIZE)
+        elif GESTURE_BACKEND == 'replay':
+            if not REPLAY: raise SystemExit("The replay backend needs AEROGESTURE_REPLAY set to a recording")
+            options = dict(path=os.path.splitext(REPLAY)[0] + '.jsonl', loop=True)
         
         self.frame_surface = None
-        self.gesture_flap = False
-        self.is_pinching = False
-        self.running = True
-        self.lock = threading.Lock()
         
-        # Buffer for smoothing
-        self.smooth_dist = 0
-        self.ema_alpha = 0.3 
+        # Preview off: skip the overlay and the surface entirely
+        self.show_preview = True
         
-        self.thread = threading.Thread(target=self.update, daemon=True)
-        self.thread.start()
-
-    def update(self):
-        while self.running:
-            success, frame = self.cap.read()
-            if not success:
-                time.sleep(0.1)
-                continue
-            
-            frame = cv2.flip(frame, 1)
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.hands.process(rgb)
-            
-            flap_trigger = False
-            
-            if results.multi_hand_landmarks:
-                lm = results.multi_hand_landmarks[0]
-                h, w, _ = frame.shape
-                
-                # Tips: 4 (Thumb), 8 (Index)
-                # Base for scale: 0 (Wrist), 5 (Index Base/MCP)
-                thumb_tip = lm.landmark[4]
-                index_tip = lm.landmark[8]
-                wrist = lm.landmark[0]
-                index_base = lm.landmark[5]
-                
-                # Pixel coordinates
-                p_thumb = (thumb_tip.x * w, thumb_tip.y * h)
-                p_index = (index_tip.x * w, index_tip.y * h)
-                p_wrist = (wrist.x * w, wrist.y * h)
-                p_base = (index_base.x * w, index_base.y * h)
-                
-                # Distance between tips
-                dist = math.hypot(p_thumb[0]-p_index[0], p_thumb[1]-p_index[1])
-                
-                # Scale normalization: using distance from wrist to index base as hand size
-                hand_size = math.hypot(p_wrist[0]-p_base[0], p_wrist[1]-p_base[1])
-                if hand_size == 0: hand_size = 1
-                
-                # Relative distance (percentage of hand size)
-                rel_dist = (dist / hand_size) * 100
-                
-                # Smoothing
-                if self.smooth_dist == 0: self.smooth_dist = rel_dist
-                self.smooth_dist = (self.ema_alpha * rel_dist) + ((1 - self.ema_alpha) * self.smooth_dist)
-                
-                # GESTURE THRESHOLDS (Recalibrated for Stable Tracking)
-                # These settings match the 'tightness' of the original Pro mode 
-                # but work with the more stable Wrist-to-Base measurement.
-                TRIGGER = 45 
-                RELEASE = 65
-                
-                if self.smooth_dist < TRIGGER:
-                    if not self.is_pinching:
-                        flap_trigger = True
-                        self.is_pinching = True
-                    cv2.line(frame, (int(p_thumb[0]), int(p_thumb[1])), (int(p_index[0]), int(p_index[1])), (0, 255, 0), 4)
-                elif self.smooth_dist > RELEASE:
-                    self.is_pinching = False
-                    cv2.line(frame, (int(p_thumb[0]), int(p_thumb[1])), (int(p_index[0]), int(p_index[1])), (0, 255, 255), 2)
-                else:
-                    cv2.line(frame, (int(p_thumb[0]), int(p_thumb[1])), (int(p_index[0]), int(p_index[1])), (255, 0, 0), 2)
-                
-                # Draw landmarks
-                cv2.circle(frame, (int(p_thumb[0]), int(p_thumb[1])), 6, (255, 0, 255), -1)
-                cv2.circle(frame, (int(p_index[0]), int(p_index[1])), 6, (0, 255, 255), -1)
-                
-                # Vision Debug Text
-                cv2.putText(frame, f"Control: {int(self.smooth_dist)}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-            new_surface = pygame.surfarray.make_surface(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB).swapaxes(0, 1))
-            with self.lock:
-                self.frame_surface = new_surface
-                if flap_trigger: self.gesture_flap = True
-            
-            # Optimization: Dynamic sleep to prevent CPU hogging in standalone mode
-            time.sleep(0.002)
+        # Preview frame held by the main thread, and one Surface per pool buffer
+        # sharing its memory (buffer, surface) keyed by id
+        self.preview = None
+        self.surfaces = {}
+        
+        # Process mode's latest (HandReading, smoothed distance, zone) for the
+        # overlay; None when no hand is visible
+        self.hand = None
+        self.overlay_font = pygame.font.Font(None, 26)
+        self.status_font = pygame.font.Font(None, 18)
+        
+        # Paces detection against the game loop's frame budget
+        self.governor = RateGovernor()
+        
+        # Capture -> inference -> flag -> game loop -> flip timestamps per flap
+        self.latency = LatencyTracker()
+        self.show_latency = False
+        
+        # Active SessionRecorder while F4 recording is on (its prefix when the
+        # worker process records)
+        self.recorder = None
+        
+        # Worker process: capture, detection and pinch all run there, and
+        # get_state() polls its results; there is no gesture thread here
+        self.worker = self.engine = None
+        if GESTURE_PROCESS:
+            self.worker = InferenceProcess(320, 240, GESTURE_BACKEND, options, PINCH_FILTER, replay=video)
+            self.frames = self.worker.frames
+        else:
+            # Capture runs on its own thread; the gesture thread only sees the newest frame.
+            # Two consumers hold frames: inference there and the preview in get_state()
+            source = ReplayCapture(video, loop=True) if video else None
+            self.camera = CameraCapture(320, 240, consumers=2, source=source)
+            self.frames = self.camera.frames
+            self.backend = make_backend(GESTURE_BACKEND, **options)
+            self.engine = GestureThread(self.camera, self.backend, PinchDetector(filter=PINCH_FILTER),
+                                        latency=self.latency, pace=self.governor.next_interval,
+                                        flap_info=lambda: {'detect_hz': round(self.governor.rate)})
+
+    def poll_worker(self):
+        """Process mode: pick up the worker's newest detection and pace the next one;
+        True when a pinch started"""
+        detection = self.worker.poll()
+        if detection is None: return False
+        self.latency.inferred(detection.captured, detection.inferred)
+        self.hand = (detection.reading, detection.smooth_dist, detection.zone) if detection.reading else None
+        if detection.flap:
+            self.latency.flagged(*detection.flap, detect_hz=round(self.governor.rate))
+        self.worker.set_wait(self.governor.next_interval(detection.work, detection.near_pinch))
+        return bool(detection.flap)
 
     def get_state(self):
-        with self.lock:
-            flap = self.gesture_flap
-            self.gesture_flap = False
-            return flap, self.frame_surface
+        if self.engine:
+            flap = self.engine.take_flap()
+        else:
+            flap = self.poll_worker()
+            if flap: self.latency.consumed(time.perf_counter())
+        if self.show_preview:
+            self.refresh_preview()
+        return flap, self.frame_surface
+
+    def refresh_preview(self):
+        """Swap the held preview frame for the newest one, at camera rate"""
+        frame = self.frames.take(self.preview.seq if self.preview else 0, timeout=0)
+        if frame is None: return
+        if self.preview: self.frames.release(self.preview.image)
+        self.preview = frame
+        
+        entry = self.surfaces.get(id(frame.image))
+        if entry is None or entry[0] is not frame.image:
+            h, w, _ = frame.image.shape
+            entry = (frame.image, pygame.image.frombuffer(frame.image, (w, h), 'RGB'))
+            self.surfaces[id(frame.image)] = entry
+        self.frame_surface = entry[1]
+
+    def draw_overlay(self, surface, origin=(0, 0)):
+        """Draw the latest pinch overlay and loop timings over the blitted preview"""
+        if not self.show_preview: return
+        ox, oy = origin
+        hand = self.engine.hand if self.engine else self.hand
+        if hand:
+            reading, smooth_dist, zone = hand
+            line_color, line_width = self.ZONE_STYLE[zone]
+            t = (ox + int(reading.thumb[0]), oy + int(reading.thumb[1]))
+            i = (ox + int(reading.index[0]), oy + int(reading.index[1]))
+            pygame.draw.line(surface, line_color, t, i, line_width)
+            pygame.draw.circle(surface, (255, 0, 255), t, 6)
+            pygame.draw.circle(surface, (255, 255, 0), i, 6)
+            
+            # Vision Debug Text
+            surface.blit(text_cache.render(self.overlay_font, f"Control: {int(smooth_dist)}", (255, 255, 255)), (ox + 10, oy + 12))
+        
+        if self.recorder:
+            pygame.draw.circle(surface, (255, 40, 40), (ox + 300, oy + 20), 7)
+        
+        times = self.governor.loop_times()
+        status = f"Detect {times['detect_hz']:.0f}Hz  game {times['main_ms']:.1f}ms"
+        height = self.frame_surface.get_height() if self.frame_surface else 240
+        surface.blit(text_cache.render(self.status_font, status, (200, 200, 200)), (ox + 10, oy + height - 18))
+
+    def draw_latency(self, surface, rect):
+        """Rolling p50/p95 per stage and an end-to-end flap latency histogram"""
+        x, y, w, h = rect
+        pygame.draw.rect(surface, (0, 0, 0), rect)
+        stages = self.latency.stage_times()
+        for col, text in ((8, "LATENCY ms"), (170, "p50"), (230, "p95")):
+            surface.blit(text_cache.render(self.status_font, text, NEON_CYAN), (x + col, y + 6))
+        for row, name in enumerate(['frame age', 'captured->inferred', 'inferred->flagged',
+                                    'flagged->consumed', 'consumed->flipped', 'total']):
+            p50, p95 = stages.get(name, (0.0, 0.0))
+            for col, text in ((8, name.replace('->', ' > ')), (170, f"{p50:.1f}"), (230, f"{p95:.1f}")):
+                surface.blit(text_cache.render(self.status_font, text, WHITE), (x + col, y + 24 + row * 15))
+        
+        # 10 ms bins, 0-200 ms; the last bar also holds everything slower
+        counts = self.latency.histogram()
+        peak = max(counts) or 1
+        base, bar_w, bar_h = y + h - 14, (w - 16) // len(counts), h - 130
+        for i, count in enumerate(counts):
+            height = int(bar_h * count / peak)
+            pygame.draw.rect(surface, NEON_LIME, (x + 8 + i * bar_w, base - height, bar_w - 2, height))
+        surface.blit(text_cache.render(self.status_font, "0", WHITE), (x + 8, base + 2))
+        surface.blit(text_cache.render(self.status_font, f"flaps: {len(self.latency.flaps)}   200+ ms", WHITE), (x + w - 130, base + 2))
+
+    def export_latency(self):
+        count = self.latency.write_csv(LATENCY_CSV)
+        print(f"Wrote {count} flaps to {LATENCY_CSV}")
+
+    def toggle_recording(self):
+        """Start or stop recording the camera and hand readings for replay"""
+        recorder = self.recorder
+        if recorder:
+            self.recorder = None
+            if self.worker:
+                # The worker reports what it recorded
+                self.worker.record(None)
+                return
+            self.camera.recorder = self.engine.recorder = None
+            recorder.close()
+            print(f"Recorded {recorder.frames} frames and {recorder.readings} readings to {recorder.prefix}.avi/.jsonl")
+            return
+        os.makedirs(RECORDINGS_DIR, exist_ok=True)
+        prefix = os.path.join(RECORDINGS_DIR, datetime.now().strftime('session-%Y%m%d-%H%M%S'))
+        if self.worker:
+            # The worker owns the camera and records there
+            self.recorder = prefix
+            self.worker.record(prefix)
+            return
+        self.recorder = SessionRecorder(prefix, fps=self.camera.fps)
+        self.camera.recorder = self.engine.recorder = self.recorder
+
+    def set_preview(self, visible):
+        self.show_preview = visible
+        if not visible:
+            if self.preview: self.frames.release(self.preview.image)
+            self.preview = None
+            self.frame_surface = None
 
     def stop(self):
-        self.running = False
-        self.cap.release()
-
-# --- Initialize Gesture Thread ---
-gesture_cam = GestureController()
+        if self.recorder: self.toggle_recording()
+        if self.worker:
+            # Surfaces over the shared frames must go before the memory is unmapped
+            self.set_preview(False)
+            self.surfaces = {}
+            self.worker.stop()
+        else:
+            self.camera.stop()
+            # Let an in-flight detection finish before the backend is torn down
+            self.engine.stop()
+            self.backend.stop()
+            for line in inference_summary(self.camera, self.backend, self.engine.inferred, self.engine.skipped):
+                print(line)
+        print(self.governor.summary())
+        total = self.latency.stage_times().get('total')
+        if total: print(f"Camera to flap: p50 {total[0]:.1f} ms, p95 {total[1]:.1f} ms over the last {len(self.latency.flaps)} flaps")
 
 # --- Particles ---
-particles = []
+# Kept as NumPy arrays (effects.py), so a frame costs a few vectorised
+# operations and one blits() call however many particles are alive
+particles = ParticleSystem(lifetime=0.6, max_size=6)
 def add_particle(x, y, color):
-    particles.append({
-        'x': x, 'y': y,
-        'vx': random.uniform(-40, 0),
-        'vy': random.uniform(-15, 15),
-        'life': 0.6,
-        'color': color
-    })
-
-def update_draw_particles(surface, dt):
-    for p in particles[:]:
-        p['life'] -= dt
-        p['x'] += p['vx'] * dt
-        p['y'] += p['vy'] * dt
-        if p['life'] <= 0:
-            particles.remove(p)
-            continue
-        size = int(6 * (p['life'] / 0.6))
-        if size > 0:
-            pygame.draw.circle(surface, p['color'], (int(p['x']), int(p['y'])), size)
+    particles.emit(x, y, color)
+
+def update_particles(dt):
+    """Advance the particles; returns the rects they will be drawn in"""
+    particles.update(dt)
+    return particles.rects()
+
+def draw_particles(surface):
+    particles.draw(surface)
 
 # --- Background ---
 static_bg = pygame.Surface((GAME_WIDTH, GAME_HEIGHT))
@@ -226,8 +417,163 @@ static_bg.fill(BG_DARK)
 for y in range(0, GAME_HEIGHT, 4):
     pygame.draw.line(static_bg, (20, 20, 60), (0, y), (GAME_WIDTH, y))
 
-stars = [{'x': random.randint(0, GAME_WIDTH), 'y': random.randint(0, GAME_HEIGHT), 
-          'speed': random.uniform(10, 60)} for _ in range(50)]
+stars = Starfield(GAME_WIDTH, GAME_HEIGHT, count=50, speed=(10, 60), color=(200,200,255))
+
+def update_draw_stars(surface, dt, restored):
+    """Scroll the stars (the bottom layer) and draw them wherever the game area
+    was restored from static_bg: `restored`, plus the spots of stars that moved
+    to another pixel, which this restores itself and returns"""
+    moved = []
+    area = surface.get_rect()
+    for x, y in stars.update(dt):
+        rect = pygame.Rect(x - 1, y - 1, 3, 3).clip(area)
+        surface.blit(static_bg, rect, rect)
+        moved.append(rect)
+    stars.draw(surface, restored + moved)
+    return moved
+
+# --- Compositor ---
+def rect_difference(rect, others):
+    """The parts of `rect` not covered by any of `others`, as disjoint rects"""
+    pieces = [rect]
+    for other in others:
+        remaining = []
+        for piece in pieces:
+            overlap = piece.clip(other)
+            if not overlap:
+                remaining.append(piece)
+                continue
+            # Bands above and below the overlap, then left and right of it
+            if overlap.top > piece.top: remaining.append(pygame.Rect(piece.left, piece.top, piece.width, overlap.top - piece.top))
+            if overlap.bottom < piece.bottom: remaining.append(pygame.Rect(piece.left, overlap.bottom, piece.width, piece.bottom - overlap.bottom))
+            if overlap.left > piece.left: remaining.append(pygame.Rect(piece.left, overlap.top, overlap.left - piece.left, overlap.height))
+            if overlap.right < piece.right: remaining.append(pygame.Rect(overlap.right, overlap.top, piece.right - overlap.right, overlap.height))
+        pieces = remaining
+    return pieces
+
+class Compositor:
+    """Keeps the window between frames and pushes only the regions that changed.
+
+    The game area is drawn straight into a subsurface of the screen over
+    static_bg. Each frame restores from static_bg just the regions that
+    change: where moving things were and are now, stars that moved to
+    another pixel, and text that changed. Then everything is redrawn in the
+    usual order (stars, particles, pipes, bird, text), but only into those
+    regions, so whatever is on top elsewhere stays on top. Those regions,
+    the camera when a new preview frame arrives and the leaderboard when its
+    data changes go to display.update(). A state change or window expose
+    redraws everything.
+    """
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.view = screen.subsurface((CAMERA_WIDTH, 0, GAME_WIDTH, GAME_HEIGHT))
+        self.full = True
+        self.state = None
+        # Game-area rects: last frame's moving things, and everything restored this frame
+        self.moving = []
+        self.regions = []
+        # Rendered text as [(surface, rect)], and the (font, text, colour, pos) list it came from
+        self.texts = []
+        self.text_key = None
+        # Screen rects redrawn outside the game area
+        self.dirty = []
+        self.camera_key = None
+        self.board = None
+
+    def invalidate(self):
+        """Redraw and push the whole window next frame"""
+        self.full = True
+
+    def begin(self, state, moving, texts):
+        """Start a frame. `moving` are the game-area rects moving things will be
+        drawn in; `texts` are (font, text, colour, topleft) for this frame"""
+        if state != self.state:
+            self.state, self.full = state, True
+        changed = []
+        if texts != self.text_key:
+            changed = [rect for _, rect in self.texts]
+            self.texts = []
+            for font, text, color, pos in texts:
+                surface = text_cache.render(font, text, color)
+                self.texts.append((surface, surface.get_rect(topleft=pos)))
+            self.text_key = texts
+            changed += [rect for _, rect in self.texts]
+        
+        area = self.view.get_rect()
+        if self.full:
+            self.regions = [area]
+            self.camera_key = self.board = None
+        else:
+            # Off-screen parts would shift the restored pixels
+            self.regions = [r for r in (rect.clip(area) for rect in self.moving + moving + changed) if r]
+        self.moving = moving
+        for rect in self.regions:
+            self.view.blit(static_bg, rect, rect)
+
+    def restored(self, rects):
+        """Add game-area rects the caller restored from static_bg itself"""
+        self.regions.extend(rects)
+
+    def draw_clipped(self, bounds, draw):
+        """Call draw(view) clipped to each restored region touching `bounds`.
+        Opaque things only: where regions overlap they are drawn twice."""
+        for i in bounds.collidelistall(self.regions):
+            self.view.set_clip(self.regions[i])
+            draw(self.view)
+        self.view.set_clip(None)
+
+    def draw_texts(self):
+        # Soft edges would darken if blitted twice, so split the overlapping
+        # regions into pieces that don't
+        for surface, rect in self.texts:
+            done = []
+            for i in rect.collidelistall(self.regions):
+                for clip in rect_difference(rect.clip(self.regions[i]), done):
+                    self.view.blit(surface, clip, clip.move(-rect.x, -rect.y))
+                    done.append(clip)
+
+    def draw_camera(self, cam_surface):
+        """Camera preview and latency panel, when a new frame or flap came in"""
+        latency = gesture_cam.show_latency
+        panels = (gesture_cam.show_preview, latency)
+        key = (gesture_cam.preview.seq if gesture_cam.preview else 0, panels, len(gesture_cam.latency.log) if latency else 0)
+        if key == self.camera_key: return
+        # Below the preview only the latency panel changes
+        whole = latency or self.camera_key is None or self.camera_key[1] != panels
+        column = pygame.Rect(0, 0, CAMERA_WIDTH, SCREEN_HEIGHT if whole else CAMERA_HEIGHT)
+        self.camera_key = key
+        self.screen.fill((0,0,0), column)
+        if cam_surface:
+            self.screen.blit(cam_surface, (0,0))
+            gesture_cam.draw_overlay(self.screen)
+        pygame.draw.rect(self.screen, NEON_CYAN, (0,0,CAMERA_WIDTH, CAMERA_HEIGHT), 2)
+        if latency:
+            gesture_cam.draw_latency(self.screen, (0, CAMERA_HEIGHT, CAMERA_WIDTH, SCREEN_HEIGHT - CAMERA_HEIGHT))
+        self.dirty.append(column)
+
+    def draw_leaderboard(self, board):
+        """Leaderboard panel, when the feed delivered a new board"""
+        if board is self.board: return
+        self.board = board
+        lb_x = CAMERA_WIDTH + GAME_WIDTH
+        panel = pygame.Rect(lb_x, 0, LEADERBOARD_WIDTH, GAME_HEIGHT)
+        self.screen.blit(static_bg, panel, (0,0,LEADERBOARD_WIDTH, GAME_HEIGHT))
+        self.screen.blit(text_cache.render(small_font, "GLOBAL TOP SCORES", NEON_MAGENTA), (lb_x + 50, 30))
+        for idx, row in enumerate((board or [])[:10]):
+            score_val = row.get('best_score')
+            if score_val is None: score_val = 0
+            txt = f"#{idx+1} {row['username'][:12]:<12} {int(score_val)}"
+            self.screen.blit(text_cache.render(small_font, txt, WHITE), (lb_x + 20, 80 + idx*38))
+        self.dirty.append(panel)
+
+    def present(self):
+        if self.full:
+            pygame.display.flip()
+        else:
+            pygame.display.update([rect.move(CAMERA_WIDTH, 0) for rect in self.regions] + self.dirty)
+        self.full = False
+        self.dirty = []
 
 # --- Classes ---
 class Bird(pygame.sprite.Sprite):
@@ -239,6 +585,10 @@ class Bird(pygame.sprite.Sprite):
         self.angle = 0
         self.wing_angle = 0
         self.wing_dir = 1
+        # Drawn into a sprite and blitted: clipped blits are pixel-exact,
+        # clipped polygons are not
+        self.image = pygame.Surface((53, 43), pygame.SRCALPHA)
+        self.image_wing = None
     
     def flap(self):
         self.velocity = FLAP_STRENGTH
@@ -265,10 +615,23 @@ class Bird(pygame.sprite.Sprite):
             return False
         return True
 
+    def bounds(self):
+        """Game-area rect covering the body, beak and wing"""
+        return pygame.Rect(self.rect.centerx - CAMERA_WIDTH - 21, self.rect.centery - 21, 53, 43)
+
     def draw(self, surface):
-        # Local coordinates on game surface
-        lx = self.rect.centerx - CAMERA_WIDTH
         ly = self.rect.centery
+        # Wing top relative to the centre, rounded the way Rect rounds it
+        wing_y = pygame.Rect(0, ly - 5 + math.sin(math.radians(self.wing_angle)) * 8, 0, 0).y - ly
+        if wing_y != self.image_wing:
+            self.image.fill((0, 0, 0, 0))
+            self.render(self.image, wing_y)
+            self.image_wing = wing_y
+        surface.blit(self.image, self.bounds())
+
+    def render(self, surface, wing_y):
+        # Local coordinates on the sprite
+        lx, ly = 21, 21
         
         # 1. Body (Yellow)
         pygame.draw.circle(surface, YELLOW, (lx, ly), self.radius)
@@ -287,45 +650,69 @@ class Bird(pygame.sprite.Sprite):
         pygame.draw.polygon(surface, (0,0,0), beak_pts, 2)
         
         # 4. Wing (White)
-        wing_y_off = math.sin(math.radians(self.wing_angle)) * 8
-        wing_rect = pygame.Rect(lx - 20, ly - 5 + wing_y_off, 18, 12)
+        wing_rect = pygame.Rect(lx - 20, ly + wing_y, 18, 12)
         pygame.draw.ellipse(surface, WHITE, wing_rect)
         pygame.draw.ellipse(surface, (0,0,0), wing_rect, 1)
 
-class Pipe(pygame.sprite.Sprite):
-    def __init__(self, x, height, is_bottom):
-        super().__init__()
-        self.width = 80
-        self.height = height
-        self.rect = pygame.Rect(CAMERA_WIDTH + x, 0, self.width, self.height)
-        if is_bottom: self.rect.y = GAME_HEIGHT - self.height
-        
-        self.image = pygame.Surface((self.width, self.height))
-        self.image.fill(NEON_LIME)
-        # Detail
-        pygame.draw.rect(self.image, (0, 100, 0), (self.width-15, 0, 15, self.height))
-        pygame.draw.rect(self.image, (0, 60, 0), (0, 0, self.width, self.height), 3)
-        # Cap
-        cap_h = 25
-        if is_bottom:
-            pygame.draw.rect(self.image, (80, 255, 80), (0, 0, self.width, cap_h))
-            pygame.draw.rect(self.image, (0, 60, 0), (0, 0, self.width, cap_h), 2)
-        else:
-            pygame.draw.rect(self.image, (80, 255, 80), (0, self.height - cap_h, self.width, cap_h))
-            pygame.draw.rect(self.image, (0, 60, 0), (0, self.height - cap_h, self.width, cap_h), 2)
+# --- Pipes ---
+# Pipes are sliced from two tall pre-rendered textures, one per orientation,
+# so a spawn draws nothing, and Pipe objects are recycled through pipe_pool
+PIPE_WIDTH = 80
+PIPE_CAP = 25
+PIPE_BORDER = 3
+
+def render_pipe_texture(height, is_bottom):
+    image = pygame.Surface((PIPE_WIDTH, height))
+    image.fill(NEON_LIME)
+    # Detail
+    pygame.draw.rect(image, (0, 100, 0), (PIPE_WIDTH-15, 0, 15, height))
+    pygame.draw.rect(image, (0, 60, 0), (0, 0, PIPE_WIDTH, height), PIPE_BORDER)
+    # Cap
+    cap_y = 0 if is_bottom else height - PIPE_CAP
+    pygame.draw.rect(image, (80, 255, 80), (0, cap_y, PIPE_WIDTH, PIPE_CAP))
+    pygame.draw.rect(image, (0, 60, 0), (0, cap_y, PIPE_WIDTH, PIPE_CAP), 2)
+    return image
+
+PIPE_TEXTURES = {is_bottom: render_pipe_texture(GAME_HEIGHT, is_bottom) for is_bottom in (False, True)}
+
+class Pipe:
+    __slots__ = ('rect', 'is_bottom', 'scored')
+
+    def __init__(self):
+        self.rect = pygame.Rect(0, 0, PIPE_WIDTH, 0)
+
+    def reset(self, x, height, is_bottom):
+        self.rect.update(CAMERA_WIDTH + x, GAME_HEIGHT - height if is_bottom else 0, PIPE_WIDTH, height)
+        self.is_bottom = is_bottom
+        self.scored = False
+        return self
 
     def update(self, dt):
+        """Move left; False once the pipe has left the game area"""
         self.rect.x -= PIPE_SPEED * dt
-        if self.rect.right < CAMERA_WIDTH: self.kill()
-            
+        return self.rect.right >= CAMERA_WIDTH
+
+    def bounds(self):
+        return self.rect.move(-CAMERA_WIDTH, 0)
+
     def draw(self, surface):
-        surface.blit(self.image, (self.rect.x - CAMERA_WIDTH, self.rect.y))
+        # Every row between the cap and the far border looks the same, so a pipe of
+        # any height is the texture's near end plus its last few rows
+        texture = PIPE_TEXTURES[self.is_bottom]
+        x, y, height = self.rect.x - CAMERA_WIDTH, self.rect.y, self.rect.height
+        end = PIPE_BORDER if self.is_bottom else PIPE_CAP
+        surface.blit(texture, (x, y), (0, 0, PIPE_WIDTH, height - end))
+        surface.blit(texture, (x, y + height - end), (0, GAME_HEIGHT - end, PIPE_WIDTH, end))
+
+pipe_pool = []
+def spawn_pipe(x, height, is_bottom):
+    return (pipe_pool.pop() if pipe_pool else Pipe()).reset(x, height, is_bottom)
 
 def create_pipes():
     min_h = 55
     avail_h = GAME_HEIGHT - PIPE_GAP - (2 * min_h)
     top = min_h + random.uniform(0, 1) * avail_h
-    return [Pipe(GAME_WIDTH + 50, int(top), False), Pipe(GAME_WIDTH + 50, int(GAME_HEIGHT - PIPE_GAP - top), True)]
+    return [spawn_pipe(GAME_WIDTH + 50, int(top), False), spawn_pipe(GAME_WIDTH + 50, int(GAME_HEIGHT - PIPE_GAP - top), True)]
 
 # --- Reset ---
 bird = Bird()
@@ -334,6 +721,7 @@ pipes = []
 def reset_game():
     global bird, pipes, SCORE, GAME_STATE, pipe_timer, START_TIME
     bird = Bird()
+    pipe_pool.extend(pipes)
     pipes = []
     SCORE = 0
     GAME_STATE = "PLAYING"
@@ -347,128 +735,130 @@ def _bg_register(username, callback):
         if r.status_code == 200: callback(r.json().get('player_id'))
     except: callback(None)
 
-def _bg_submit(p_id, score, dur, callback=None):
-    try:
-        requests.post(f"{API_URL}/score/submit", json={"player_id": p_id, "score": score, "duration": dur}, timeout=3.0)
-        if callback: callback()
-    except: pass
-
-def _bg_fetch(callback):
-    try:
-        r = requests.get(f"{API_URL}/leaderboard?limit=10", timeout=3.0)
-        if r.status_code == 200: callback(r.json().get('leaderboard', []))
-    except: pass
-
 def register_player(username):
     # This is still sync for the login screen but we'll add a connecting state
     threading.Thread(target=_bg_register, args=(username, lambda pid: setattr(sys.modules[__name__], 'PLAYER_ID', pid)), daemon=True).start()
 
 def submit_score_async(p_id, score, dur):
     if not p_id: return
-    threading.Thread(target=_bg_submit, args=(p_id, score, dur), daemon=True).start()
+    score_batcher.add(p_id, score, dur)
 
-def fetch_leaderboard_async():
+def follow_leaderboard_async():
     def update_lb(data):
         setattr(sys.modules[__name__], 'LEADERBOARD_DATA', data)
-    threading.Thread(target=_bg_fetch, args=(update_lb,), daemon=True).start()
-
-# --- Main Game Loop ---
-while True:
-    dt = clock.tick(90) / 1000.0 # Adjusted for smoothness vs performance
-    if dt > 0.05: dt = 0.05
-    
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            gesture_cam.stop()
-            pygame.quit()
-            sys.exit()
-            
-        if event.type == pygame.KEYDOWN:
-            if GAME_STATE == "USERNAME":
-                if event.key == pygame.K_RETURN and USERNAME:
-                    reset_game()
-                    # Start registration in background - FIXED to be async
-                    threading.Thread(target=_bg_register, args=(USERNAME, lambda pid: setattr(sys.modules[__name__], 'PLAYER_ID', pid)), daemon=True).start()
-                elif event.key == pygame.K_BACKSPACE: USERNAME = USERNAME[:-1]
-                elif event.unicode.isprintable() and len(USERNAME) < 12: USERNAME += event.unicode.upper()
-            elif GAME_STATE == "PLAYING" and event.key == pygame.K_SPACE:
-                bird.flap()
-            elif GAME_STATE == "GAME_OVER" and event.key == pygame.K_ESCAPE:
-                GAME_STATE = "USERNAME"; USERNAME = ""
-
-    gesture_flap, cam_surface = gesture_cam.get_state()
-    
-    screen.fill((0,0,0))
-    if cam_surface: screen.blit(cam_surface, (0,0))
-    pygame.draw.rect(screen, NEON_CYAN, (0,0,CAMERA_WIDTH, CAMERA_HEIGHT), 2)
-    
-    game_s = pygame.Surface((GAME_WIDTH, GAME_HEIGHT))
-    game_s.blit(static_bg, (0,0))
-    for star in stars:
-        star['x'] -= star['speed'] * dt
-        if star['x'] < 0: star['x'] = GAME_WIDTH
-        pygame.draw.circle(game_s, (200,200,255), (int(star['x']), int(star['y'])), 1)
-            
-    if GAME_STATE == "USERNAME":
-        cx = GAME_WIDTH // 2
-        game_s.blit(title_font.render("AeroGesture", True, NEON_MAGENTA), (cx-130, 130))
-        game_s.blit(game_font.render("ENTER HERO NAME:", True, WHITE), (cx-130, 210))
-        game_s.blit(game_font.render(USERNAME + "|", True, YELLOW), (cx-50, 260))
-        game_s.blit(small_font.render("PINCH GESTURE TO START", True, NEON_LIME), (cx-120, 350))
-        if gesture_flap and USERNAME: 
-            # Quick sync check for ID, then go
-            reset_game()
-            threading.Thread(target=_bg_register, args=(USERNAME, lambda pid: setattr(sys.modules[__name__], 'PLAYER_ID', pid)), daemon=True).start()
-            
-    elif GAME_STATE == "PLAYING":
-        if gesture_flap: bird.flap()
-        if not bird.update(dt):
-            GAME_STATE = "GAME_OVER"
-            submit_score_async(PLAYER_ID, SCORE, time.time() - START_TIME)
-            fetch_leaderboard_async()
+    threading.Thread(target=follow_leaderboard, args=(API_URL, update_lb), kwargs={'interval': 15.0}, daemon=True).start()
+
+if __name__ == '__main__':
+    # --- Initialize Gesture Thread ---
+    gesture_cam = GestureController()
+
+    score_batcher = ScoreBatcher(API_URL)
+    follow_leaderboard_async()
+    compositor = Compositor(screen)
+
+    # --- Main Game Loop ---
+    while True:
+        dt = clock.tick(GAME_FPS) / 1000.0 # Adjusted for smoothness vs performance
+        if dt > 0.05: dt = 0.05
+        # Work time of the previous frame, without the tick's sleep
+        gesture_cam.governor.main_frame(clock.get_rawtime() / 1000.0, GAME_STATE)
         
-        pipe_timer += dt
-        if pipe_timer > PIPE_SPAWN_TIME:
-            pipes.extend(create_pipes())
-            pipe_timer = 0
-            
-        for p in pipes[:]:
-            p.update(dt)
-            if p.rect.colliderect(bird.rect):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                gesture_cam.stop()
+                # The last game's score may still be waiting for its batch
+                score_batcher.flush()
+                print(text_cache.summary())
+                pygame.quit()
+                sys.exit()
+                
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                compositor.invalidate()
+                
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F1:
+                    gesture_cam.set_preview(not gesture_cam.show_preview)
+                elif event.key == pygame.K_F2:
+                    gesture_cam.show_latency = not gesture_cam.show_latency
+                elif event.key == pygame.K_F3:
+                    gesture_cam.export_latency()
+                elif event.key == pygame.K_F4:
+                    gesture_cam.toggle_recording()
+                elif GAME_STATE == "USERNAME":
+                    if event.key == pygame.K_RETURN and USERNAME:
+                        reset_game()
+                        # Start registration in background - FIXED to be async
+                        threading.Thread(target=_bg_register, args=(USERNAME, lambda pid: setattr(sys.modules[__name__], 'PLAYER_ID', pid)), daemon=True).start()
+                    elif event.key == pygame.K_BACKSPACE: USERNAME = USERNAME[:-1]
+                    elif event.unicode.isprintable() and len(USERNAME) < 12: USERNAME += event.unicode.upper()
+                elif GAME_STATE == "PLAYING" and event.key == pygame.K_SPACE:
+                    bird.flap()
+                elif GAME_STATE == "GAME_OVER" and event.key == pygame.K_ESCAPE:
+                    GAME_STATE = "USERNAME"; USERNAME = ""
+
+        gesture_flap, cam_surface = gesture_cam.get_state()
+        
+        # --- Update ---
+        if GAME_STATE == "USERNAME":
+            if gesture_flap and USERNAME: 
+                # Quick sync check for ID, then go
+                reset_game()
+                threading.Thread(target=_bg_register, args=(USERNAME, lambda pid: setattr(sys.modules[__name__], 'PLAYER_ID', pid)), daemon=True).start()
+                
+        elif GAME_STATE == "PLAYING":
+            if gesture_flap: bird.flap()
+            if not bird.update(dt):
                 GAME_STATE = "GAME_OVER"
                 submit_score_async(PLAYER_ID, SCORE, time.time() - START_TIME)
-                fetch_leaderboard_async()
-            if not getattr(p, 'scored', False) and p.rect.right < bird.rect.left and p.rect.y == 0:
-                SCORE += 1; p.scored = True
+            
+            pipe_timer += dt
+            if pipe_timer > PIPE_SPAWN_TIME:
+                pipes.extend(create_pipes())
+                pipe_timer = 0
+                
+            for p in pipes[:]:
+                if not p.update(dt):
+                    pipes.remove(p)
+                    pipe_pool.append(p)
+                    continue
+                if p.rect.colliderect(bird.rect):
+                    GAME_STATE = "GAME_OVER"
+                    submit_score_async(PLAYER_ID, SCORE, time.time() - START_TIME)
+                if not p.scored and p.rect.right < bird.rect.left and p.rect.y == 0:
+                    SCORE += 1; p.scored = True
+            
+        elif GAME_STATE == "GAME_OVER":
+            if gesture_flap: reset_game()
         
-        update_draw_particles(game_s, dt)
-        for p in pipes: p.draw(game_s)
-        bird.draw(game_s)
-        game_s.blit(title_font.render(str(SCORE), True, WHITE), (GAME_WIDTH//2 - 20, 50))
+        # Also on the frame a pinch starts a game, so the new bird's spot is restored next frame
+        moving = []
+        if GAME_STATE == "PLAYING":
+            moving = update_particles(dt) + [p.bounds() for p in pipes] + [bird.bounds()]
         
-    elif GAME_STATE == "GAME_OVER":
-        for p in pipes: p.draw(game_s)
-        bird.draw(game_s)
+        # --- Draw: only what changed reaches the display ---
         cx = GAME_WIDTH // 2
-        game_s.blit(title_font.render("GAME OVER", True, NEON_MAGENTA), (cx-120, 180))
-        game_s.blit(game_font.render(f"SCORE: {SCORE}", True, WHITE), (cx-70, 240))
-        game_s.blit(small_font.render("PINCH TO RETRY / ESC TO MENU", True, NEON_LIME), (cx-150, 320))
-        if gesture_flap: reset_game()
+        if GAME_STATE == "USERNAME":
+            texts = [(title_font, "AeroGesture", NEON_MAGENTA, (cx-130, 130)),
+                     (game_font, "ENTER HERO NAME:", WHITE, (cx-130, 210)),
+                     (game_font, USERNAME + "|", YELLOW, (cx-50, 260)),
+                     (small_font, "PINCH GESTURE TO START", NEON_LIME, (cx-120, 350))]
+        elif GAME_STATE == "PLAYING":
+            texts = [(title_font, str(SCORE), WHITE, (GAME_WIDTH//2 - 20, 50))]
+        else:
+            texts = [(title_font, "GAME OVER", NEON_MAGENTA, (cx-120, 180)),
+                     (game_font, f"SCORE: {SCORE}", WHITE, (cx-70, 240)),
+                     (small_font, "PINCH TO RETRY / ESC TO MENU", NEON_LIME, (cx-150, 320))]
         
-    screen.blit(game_s, (CAMERA_WIDTH, 0))
-    lb_x = CAMERA_WIDTH + GAME_WIDTH
-    screen.blit(static_bg, (lb_x, 0), (0,0,LEADERBOARD_WIDTH, GAME_HEIGHT))
-    screen.blit(small_font.render("GLOBAL TOP SCORES", True, NEON_MAGENTA), (lb_x + 50, 30))
-    
-    if time.time() - LAST_LEADERBOARD_UPDATE > 15:
-        fetch_leaderboard_async()
-        LAST_LEADERBOARD_UPDATE = time.time()
-    
-    if LEADERBOARD_DATA:
-        for idx, row in enumerate(LEADERBOARD_DATA[:10]):
-            score_val = row.get('best_score')
-            if score_val is None: score_val = 0
-            txt = f"#{idx+1} {row['username'][:12]:<12} {int(score_val)}"
-            screen.blit(small_font.render(txt, True, WHITE), (lb_x + 20, 80 + idx*38))
-
-    pygame.display.flip()
+        compositor.begin(GAME_STATE, moving, texts)
+        compositor.restored(update_draw_stars(compositor.view, dt, compositor.regions))
+        if GAME_STATE == "PLAYING":
+            # Particles only exist while playing, and all of them are restored regions
+            draw_particles(compositor.view)
+        if GAME_STATE != "USERNAME":
+            for p in pipes: compositor.draw_clipped(p.bounds(), p.draw)
+            compositor.draw_clipped(bird.bounds(), bird.draw)
+        compositor.draw_texts()
+        compositor.draw_camera(cam_surface)
+        compositor.draw_leaderboard(LEADERBOARD_DATA)
+        compositor.present()
+        gesture_cam.latency.flipped(time.perf_counter())
@@ -2,16 +2,23 @@ import pygame
 import sys
 import random
 import cv2
-import mediapipe as mp
-import math
+import os
 import requests
 import time
+import threading
 from datetime import datetime
 
+from apiclient import ScoreBatcher, follow_leaderboard
+from gesture import CameraCapture, GestureThread, PinchDetector, inference_summary, make_backend
+from textcache import TextCache
+
 # --- Configuration ---
 API_URL = "http://localhost:5000/api"
 BIG_SCREEN_MODE = True
 
+# Hand detector: "mediapipe" or "skin" (see gesture.py); AEROGESTURE_BACKEND overrides it
+GESTURE_BACKEND = os.environ.get('AEROGESTURE_BACKEND', 'mediapipe')
+
 # --- Pygame Setup ---
 pygame.init()
 
@@ -33,6 +40,8 @@ title_font = pygame.font.Font(None, 80)
 game_font = pygame.font.Font(None, 50)
 small_font = pygame.font.Font(None, 30)
 tiny_font = pygame.font.Font(None, 24)
+# Labels, names and scores repeat frame after frame; render each once
+text_cache = TextCache()
 
 # --- Colors (Premium Arcade Theme) ---
 BG_DARK = (15, 15, 35)
@@ -65,7 +74,6 @@ USERNAME = ""
 PLAYER_ID = None
 START_TIME = 0
 LEADERBOARD_DATA = []
-LAST_LEADERBOARD_UPDATE = 0
 
 # --- API Functions ---
 def register_player(username):
@@ -81,77 +89,90 @@ def register_player(username):
         print("⚠️ Could not connect to server, playing offline")
     return None
 
+score_batcher = ScoreBatcher(API_URL, timeout=2)
+
 def submit_score(player_id, score, duration):
-    """Submit score to server"""
+    """Queue score for the next batch submission"""
     if not player_id:
         return
-    try:
-        requests.post(f"{API_URL}/score/submit",
-                     json={
-                         "player_id": player_id,
-                         "score": score,
-                         "duration": duration,
-                         "pipes_passed": score
-                     },
-                     timeout=2)
-    except:
-        print("⚠️ Could not submit score")
+    score_batcher.add(player_id, score, duration)
 
-def fetch_leaderboard():
-    """Fetch leaderboard from server"""
-    try:
-        response = requests.get(f"{API_URL}/leaderboard?limit=10", timeout=2)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('leaderboard', [])
-    except:
-        pass
-    return []
+def set_leaderboard(board):
+    """Called by the follow_leaderboard thread with the new top N"""
+    global LEADERBOARD_DATA
+    LEADERBOARD_DATA = board
+
+threading.Thread(target=follow_leaderboard, args=(API_URL, set_leaderboard), daemon=True).start()
 
 # --- Drawing Functions ---
-def draw_gradient_bg():
+def draw_gradient_bg(surface):
     """Draw gradient background"""
     for y in range(SCREEN_HEIGHT):
         ratio = y / SCREEN_HEIGHT
         r = int(BG_GRADIENT_TOP[0] * (1 - ratio) + BG_GRADIENT_BOTTOM[0] * ratio)
         g = int(BG_GRADIENT_TOP[1] * (1 - ratio) + BG_GRADIENT_BOTTOM[1] * ratio)
         b = int(BG_GRADIENT_TOP[2] * (1 - ratio) + BG_GRADIENT_BOTTOM[2] * ratio)
-        pygame.draw.line(screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+        pygame.draw.line(surface, (r, g, b), (0, y), (SCREEN_WIDTH, y))
 
-def draw_text_with_shadow(text, font, color, x, y, center=True):
+def draw_text_with_shadow(text, font, color, x, y, center=True, surface=None):
     """Draw text with shadow effect"""
-    # Shadow
-    shadow = font.render(text, True, TEXT_SHADOW)
-    shadow_rect = shadow.get_rect(center=(x + 3, y + 3)) if center else shadow.get_rect(topleft=(x + 3, y + 3))
-    screen.blit(shadow, shadow_rect)
-    # Main text
-    surf = font.render(text, True, color)
-    rect = surf.get_rect(center=(x, y)) if center else surf.get_rect(topleft=(x, y))
-    screen.blit(surf, rect)
+    # Text and shadow come from the cache as one surface
+    surf = text_cache.render(font, text, color, shadow=TEXT_SHADOW)
+    rect = text_cache.text_rect(surf, shadow=True, center=(x, y)) if center else text_cache.text_rect(surf, shadow=True, topleft=(x, y))
+    (surface or screen).blit(surf, rect)
     return rect
 
-def draw_panel(x, y, width, height, color=PANEL_BG):
+panel_surfaces = {}
+def draw_panel(x, y, width, height, color=PANEL_BG, surface=None):
     """Draw semi-transparent panel"""
-    panel = pygame.Surface((width, height), pygame.SRCALPHA)
-    panel.fill(color)
-    # Border glow
-    pygame.draw.rect(panel, NEON_BLUE + (100,), (0, 0, width, height), 3)
-    screen.blit(panel, (x, y))
+    panel = panel_surfaces.get((width, height, color))
+    if panel is None:
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill(color)
+        # Border glow
+        pygame.draw.rect(panel, NEON_BLUE + (100,), (0, 0, width, height), 3)
+        panel_surfaces[(width, height, color)] = panel
+    (surface or screen).blit(panel, (x, y))
+
+# --- Background Layers ---
+# Everything behind the moving parts of a screen is drawn once into a layer,
+# so a frame starts with a single blit instead of 600 gradient lines
+USERNAME_PANEL = pygame.Rect((SCREEN_WIDTH - 600) // 2, 300, 600, 200)
+layers = {}
+
+def bake_layers():
+    """Render the static background layers; call again if the window size changes"""
+    # Name entry: gradient and input panel
+    username = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    draw_gradient_bg(username)
+    draw_panel(*USERNAME_PANEL, surface=username)
+    
+    # Game: gradient, dividers, panel labels and the sky of the game area
+    game = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    draw_gradient_bg(game)
+    pygame.draw.line(game, NEON_BLUE, (CAMERA_WIDTH, 0), (CAMERA_WIDTH, SCREEN_HEIGHT), 3)
+    pygame.draw.line(game, NEON_BLUE, (CAMERA_WIDTH + GAME_WIDTH, 0), (CAMERA_WIDTH + GAME_WIDTH, SCREEN_HEIGHT), 3)
+    draw_text_with_shadow("📹 CAMERA", small_font, NEON_BLUE, CAMERA_WIDTH // 2, 20, surface=game)
+    draw_text_with_shadow("🎮 GAME", small_font, NEON_GREEN, CAMERA_WIDTH + GAME_WIDTH // 2, 20, surface=game)
+    draw_text_with_shadow("🏆 TOP PLAYERS", small_font, NEON_YELLOW, CAMERA_WIDTH + GAME_WIDTH + LEADERBOARD_WIDTH // 2, 20, surface=game)
+    game.fill((100, 150, 255), (CAMERA_WIDTH, 0, GAME_WIDTH, GAME_HEIGHT))
+    
+    # Game over: dims the frozen game area
+    overlay = pygame.Surface((GAME_WIDTH, GAME_HEIGHT), pygame.SRCALPHA)
+    overlay.fill((0, 0, 0, 180))
+    
+    layers.update(username=username.convert(), game=game.convert(), game_over=overlay.convert_alpha())
 
 def draw_username_screen():
     """Draw username entry screen"""
-    draw_gradient_bg()
+    screen.blit(layers['username'], (0, 0))
     
     # Title
     draw_text_with_shadow("🎮 FLAPPY BIRD ARCADE 🎮", title_font, NEON_PINK, SCREEN_WIDTH // 2, 100)
     draw_text_with_shadow("GESTURE CONTROLLED", game_font, NEON_BLUE, SCREEN_WIDTH // 2, 180)
     
-    # Input panel
-    panel_width = 600
-    panel_height = 200
-    panel_x = (SCREEN_WIDTH - panel_width) // 2
-    panel_y = 300
-    draw_panel(panel_x, panel_y, panel_width, panel_height)
+    # Input panel (baked into the layer)
+    panel_y = USERNAME_PANEL.y
     
     # Instructions
     draw_text_with_shadow("Enter Your Name:", game_font, WHITE, SCREEN_WIDTH // 2, panel_y + 40)
@@ -170,27 +191,12 @@ def draw_username_screen():
 
 def draw_game_screen():
     """Draw the main game screen with all panels"""
-    draw_gradient_bg()
-    
-    # Draw divider lines
-    pygame.draw.line(screen, NEON_BLUE, (CAMERA_WIDTH, 0), (CAMERA_WIDTH, SCREEN_HEIGHT), 3)
-    pygame.draw.line(screen, NEON_BLUE, (CAMERA_WIDTH + GAME_WIDTH, 0), (CAMERA_WIDTH + GAME_WIDTH, SCREEN_HEIGHT), 3)
-    
-    # Labels
-    draw_text_with_shadow("📹 CAMERA", small_font, NEON_BLUE, CAMERA_WIDTH // 2, 20)
-    draw_text_with_shadow("🎮 GAME", small_font, NEON_GREEN, CAMERA_WIDTH + GAME_WIDTH // 2, 20)
-    draw_text_with_shadow("🏆 TOP PLAYERS", small_font, NEON_YELLOW, CAMERA_WIDTH + GAME_WIDTH + LEADERBOARD_WIDTH // 2, 20)
+    # Gradient, divider lines, labels and the game area background
+    screen.blit(layers['game'], (0, 0))
 
 def draw_leaderboard():
     """Draw leaderboard on the right panel"""
-    global LEADERBOARD_DATA, LAST_LEADERBOARD_UPDATE
-    
-    # Update leaderboard every 5 seconds
-    current_time = time.time()
-    if current_time - LAST_LEADERBOARD_UPDATE > 5:
-        LEADERBOARD_DATA = fetch_leaderboard()
-        LAST_LEADERBOARD_UPDATE = current_time
-    
+    # LEADERBOARD_DATA is pushed by the follow_leaderboard thread
     start_x = CAMERA_WIDTH + GAME_WIDTH + 20
     start_y = 60
     
@@ -235,12 +241,33 @@ def draw_score_display():
     # Score
     draw_text_with_shadow(f"Score: {SCORE}", game_font, NEON_YELLOW, score_x, score_y)
 
+def draw_camera():
+    """Camera preview with the hand overlay and game state"""
+    if not frame_surface:
+        return
+    screen.blit(frame_surface, (0, 0))
+    
+    hand = gestures.hand
+    if hand:
+        reading, smooth_dist, zone = hand
+        # Readings are in camera pixels, which may not be the preview's size
+        h, w, _ = camera_frame.image.shape
+        thumb_pos = (int(reading.thumb[0] * CAMERA_WIDTH / w), int(reading.thumb[1] * CAMERA_HEIGHT / h))
+        index_pos = (int(reading.index[0] * CAMERA_WIDTH / w), int(reading.index[1] * CAMERA_HEIGHT / h))
+        if zone == 'pinch':
+            pygame.draw.line(screen, NEON_GREEN, thumb_pos, index_pos, 5)
+        pygame.draw.circle(screen, NEON_PINK, thumb_pos, 10)
+        pygame.draw.circle(screen, NEON_YELLOW, index_pos, 10)
+        # Distance as a percentage of hand size
+        screen.blit(text_cache.render(small_font, f"Pinch: {int(smooth_dist)}", NEON_GREEN), (10, 10))
+    
+    state_text = {"USERNAME": "ENTER NAME", "PLAYING": "PLAYING", "GAME_OVER": "GAME OVER"}
+    screen.blit(text_cache.render(small_font, state_text.get(GAME_STATE, ""), NEON_BLUE), (10, CAMERA_HEIGHT - 40))
+
 def draw_game_over_screen():
     """Draw game over overlay"""
     # Semi-transparent overlay
-    overlay = pygame.Surface((GAME_WIDTH, GAME_HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, 180))
-    screen.blit(overlay, (CAMERA_WIDTH, 0))
+    screen.blit(layers['game_over'], (CAMERA_WIDTH, 0))
     
     center_x = CAMERA_WIDTH + GAME_WIDTH // 2
     center_y = GAME_HEIGHT // 2
@@ -286,42 +313,63 @@ class Bird(pygame.sprite.Sprite):
     def draw(self, surface):
         surface.blit(self.image, self.rect)
 
-class Pipe(pygame.sprite.Sprite):
-    def __init__(self, x, is_bottom=True):
-        super().__init__()
-        self.width = 80
-        self.height = random.randint(150, 400)
-        
-        self.image = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
-        # Gradient pipe
-        for i in range(self.height):
-            ratio = i / self.height
-            color = (0, int(150 + 100 * ratio), 0)
-            pygame.draw.rect(self.image, color, (0, i, self.width, 1))
-        
-        # Border
-        pygame.draw.rect(self.image, NEON_GREEN, (0, 0, self.width, self.height), 3)
-        
+# Pipe heights come in 10 px steps (PIPE_HEIGHTS), so every pipe image is rendered
+# once up front instead of on each spawn, and Pipe objects are recycled
+# through pipe_pool
+PIPE_WIDTH = 80
+PIPE_HEIGHTS = range(150, 401, 10)
+
+def render_pipe(height):
+    image = pygame.Surface((PIPE_WIDTH, height), pygame.SRCALPHA)
+    # Gradient pipe
+    for i in range(height):
+        ratio = i / height
+        color = (0, int(150 + 100 * ratio), 0)
+        pygame.draw.rect(image, color, (0, i, PIPE_WIDTH, 1))
+    
+    # Border
+    pygame.draw.rect(image, NEON_GREEN, (0, 0, PIPE_WIDTH, height), 3)
+    return image.convert_alpha()
+
+PIPE_IMAGES = {height: render_pipe(height) for height in PIPE_HEIGHTS}
+
+class Pipe:
+    __slots__ = ('image', 'rect')
+
+    def reset(self, x, is_bottom=True):
+        self.image = PIPE_IMAGES[random.choice(PIPE_HEIGHTS)]
         if is_bottom:
             self.rect = self.image.get_rect(bottomleft=(CAMERA_WIDTH + x, GAME_HEIGHT))
         else:
             self.rect = self.image.get_rect(topleft=(CAMERA_WIDTH + x, 50))
+        return self
 
     def update(self):
+        """Move left; False once the pipe has left the game area"""
         self.rect.x -= PIPE_SPEED
-        if self.rect.right < CAMERA_WIDTH:
-            self.kill()
+        return self.rect.right >= CAMERA_WIDTH
 
     def draw(self, surface):
         surface.blit(self.image, self.rect)
 
+pipe_pool = []
+def spawn_pipe(x, is_bottom=True):
+    return (pipe_pool.pop() if pipe_pool else Pipe()).reset(x, is_bottom)
+
+def update_pipes():
+    """Move the pipes and return those that left the game area to the pool"""
+    for pipe in pipes[:]:
+        if not pipe.update():
+            pipes.remove(pipe)
+            pipe_pool.append(pipe)
+
 # --- Game Functions ---
 def create_pipes():
     """Generate pipe pair"""
     gap_y = random.randint(250, GAME_HEIGHT - 250)
     
-    bottom_pipe = Pipe(GAME_WIDTH + 50, is_bottom=True)
-    top_pipe = Pipe(GAME_WIDTH + 50, is_bottom=False)
+    bottom_pipe = spawn_pipe(GAME_WIDTH + 50, is_bottom=True)
+    top_pipe = spawn_pipe(GAME_WIDTH + 50, is_bottom=False)
     
     bottom_pipe.rect.top = gap_y + PIPE_GAP // 2
     top_pipe.rect.bottom = gap_y - PIPE_GAP // 2
@@ -330,29 +378,30 @@ def create_pipes():
 
 def reset_game():
     """Reset game state"""
-    global bird, pipe_group, SCORE, GAME_STATE, LAST_PIPE, score_pipe_passed, START_TIME
+    global bird, pipes, SCORE, GAME_STATE, LAST_PIPE, score_pipe_passed, START_TIME
     bird = Bird()
-    pipe_group = pygame.sprite.Group()
+    pipe_pool.extend(pipes)
+    pipes = []
     SCORE = 0
     GAME_STATE = "PLAYING"
     LAST_PIPE = pygame.time.get_ticks() - PIPE_FREQUENCY + 500
     score_pipe_passed = False
     START_TIME = time.time()
 
-# --- MediaPipe Setup ---
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
-mp_draw = mp.solutions.drawing_utils
-
-# --- OpenCV Setup ---
-cap = cv2.VideoCapture(0)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
-PINCH_THRESHOLD = 30
+# --- Gesture Setup ---
+# Capture and hand detection run on their own threads; the loop only reads
+# the flap flag and the newest frame, so a slow detection never drops a game
+# frame. Two consumers hold frames: the gesture thread and the preview.
+camera = CameraCapture(CAMERA_WIDTH, CAMERA_HEIGHT, consumers=2)
+backend_options = dict(min_detection_confidence=0.7) if GESTURE_BACKEND == 'mediapipe' else {}
+gestures = GestureThread(camera, make_backend(GESTURE_BACKEND, **backend_options), PinchDetector())
+camera_frame = None
+frame_surface = None
 
 # --- Initialize ---
+bake_layers()
 bird = Bird()
-pipe_group = pygame.sprite.Group()
+pipes = []
 score_pipe_passed = False
 
 # --- Main Game Loop ---
@@ -388,53 +437,27 @@ while running:
                     PLAYER_ID = None
 
     # --- Gesture Recognition ---
-    success, frame = cap.read()
-    if success:
-        frame = cv2.flip(frame, 1)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(frame_rgb)
+    # One flap per pinch: the detector re-arms only once the fingers open again
+    gesture_flap = gestures.take_flap()
+    frame = camera.frames.take(camera_frame.seq if camera_frame else 0, timeout=0)
+    if frame:
+        # The previous frame's buffer goes back to the capture thread
+        if camera_frame:
+            camera.frames.release(camera_frame.image)
+        camera_frame = frame
+        # Mirrored RGB, shared with the gesture thread: read only
+        frame = frame.image
+        h, w, _ = frame.shape
         
-        gesture_flap = False
-
-        if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]
-            mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-            
-            thumb_tip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP]
-            index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-            
-            h, w, _ = frame.shape
-            thumb_pos = (int(thumb_tip.x * w), int(thumb_tip.y * h))
-            index_pos = (int(index_tip.x * w), int(index_tip.y * h))
-            
-            cv2.circle(frame, thumb_pos, 10, (255, 0, 255), -1)
-            cv2.circle(frame, index_pos, 10, (0, 255, 255), -1)
-            
-            distance = math.hypot(thumb_pos[0] - index_pos[0], thumb_pos[1] - index_pos[1])
-            
-            if distance < PINCH_THRESHOLD:
-                gesture_flap = True
-                cv2.line(frame, thumb_pos, index_pos, (0, 255, 0), 5)
-            
-            # Display distance
-            cv2.putText(frame, f"Pinch: {int(distance)}", (10, 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        
-        # Display game state on camera
-        state_text = {"USERNAME": "ENTER NAME", "PLAYING": "PLAYING", "GAME_OVER": "GAME OVER"}
-        cv2.putText(frame, state_text.get(GAME_STATE, ""), (10, h - 20),
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
-        
-        # Convert to pygame surface and display
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame = cv2.resize(frame, (CAMERA_WIDTH, CAMERA_HEIGHT))
-        frame_surface = pygame.surfarray.make_surface(frame.swapaxes(0, 1))
+        # Wrap the frame as a pygame surface; only resize if the camera ignored our size
+        if (w, h) != (CAMERA_WIDTH, CAMERA_HEIGHT):
+            frame = cv2.resize(frame, (CAMERA_WIDTH, CAMERA_HEIGHT))
+        frame_surface = pygame.image.frombuffer(frame, (CAMERA_WIDTH, CAMERA_HEIGHT), 'RGB')
         
     # --- Game Logic ---
     if GAME_STATE == "USERNAME":
         draw_username_screen()
-        if success:
-            screen.blit(frame_surface, (0, 0))
+        draw_camera()
         
         # Allow starting with pinch
         if gesture_flap and len(USERNAME) > 0 and (current_time - LAST_FLAP_TIME > 500):
@@ -450,40 +473,32 @@ while running:
         
         # Update
         game_over_by_fall = not bird.update()
-        pipe_group.update()
+        update_pipes()
         
         # Create pipes
         if current_time - LAST_PIPE > PIPE_FREQUENCY:
             pipe_pair = create_pipes()
-            pipe_group.add(pipe_pair[0])
-            pipe_group.add(pipe_pair[1])
+            pipes.extend(pipe_pair)
             LAST_PIPE = current_time
             score_pipe_passed = False
         
         # Collision
-        if pygame.sprite.spritecollide(bird, pipe_group, False) or game_over_by_fall:
+        if bird.rect.collidelist([pipe.rect for pipe in pipes]) != -1 or game_over_by_fall:
             GAME_STATE = "GAME_OVER"
             duration = time.time() - START_TIME
-            submit_score(PLAYER_ID, SCORE, duration)
-            LEADERBOARD_DATA = fetch_leaderboard()  # Refresh immediately
+            submit_score(PLAYER_ID, SCORE, duration)  # Leaderboard feed pushes the new rank
         
         # Scoring
-        if not score_pipe_passed and len(pipe_group) > 0:
-            if pipe_group.sprites()[0].rect.right < bird.rect.left:
+        if not score_pipe_passed and len(pipes) > 0:
+            if pipes[0].rect.right < bird.rect.left:
                 SCORE += 1
                 score_pipe_passed = True
         
         # Draw
         draw_game_screen()
-        if success:
-            screen.blit(frame_surface, (0, 0))
+        draw_camera()
         
-        # Game area background
-        game_bg = pygame.Surface((GAME_WIDTH, GAME_HEIGHT))
-        game_bg.fill((100, 150, 255))
-        screen.blit(game_bg, (CAMERA_WIDTH, 0))
-        
-        pipe_group.draw(screen)
+        for pipe in pipes: pipe.draw(screen)
         bird.draw(screen)
         draw_score_display()
         draw_leaderboard()
@@ -491,15 +506,9 @@ while running:
     elif GAME_STATE == "GAME_OVER":
         # Keep last frame
         draw_game_screen()
-        if success:
-            screen.blit(frame_surface, (0, 0))
-        
-        # Game area background
-        game_bg = pygame.Surface((GAME_WIDTH, GAME_HEIGHT))
-        game_bg.fill((100, 150, 255))
-        screen.blit(game_bg, (CAMERA_WIDTH, 0))
+        draw_camera()
         
-        pipe_group.draw(screen)
+        for pipe in pipes: pipe.draw(screen)
         bird.draw(screen)
         draw_game_over_screen()
         draw_leaderboard()
@@ -513,6 +522,14 @@ while running:
     clock.tick(60)
 
 # Cleanup
-cap.release()
+camera.stop()
+gestures.stop()
+gestures.backend.stop()
+unsent = score_batcher.flush()
+if unsent:
+    print(f"⚠️ Could not reach the server, {unsent} scores were not submitted")
+for line in inference_summary(camera, gestures.backend, gestures.inferred, gestures.skipped):
+    print(line)
+print(text_cache.summary())
 pygame.quit()
 sys.exit()
@@ -0,0 +1,1158 @@
+"""Gesture pipeline shared by fp.py and game_multiplayer.py.
+
+A capture thread reads the camera at its own pace into a small pool of reused
+RGB buffers and publishes each frame, with its capture timestamp, to a
+LatestFrame slot. Consumers (hand inference, the camera preview) take whatever
+frame is newest whenever they are ready. Frames nobody took are simply
+replaced, so a slow consumer never leaves stale frames queued in the camera.
+
+Hand detection sits behind GestureBackend (MediaPipe landmarks, a cheap
+skin-mask detector for slow machines, or a recorded session); PinchDetector
+turns its readings into flaps. SessionRecorder and ReplayCapture record and
+replay the camera, so the pipeline also runs without one.
+
+LatencyTracker follows a flap from that capture timestamp to the display flip
+that shows it.
+
+InferenceProcess runs capture, detection and PinchDetector in a worker
+process instead, handing frames back through SharedFrames (the same
+latest-frame slot in shared memory) and readings and flaps through a shared
+array, so inference never competes with the game loop for the GIL.
+"""
+import csv
+import json
+import math
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+Frame = namedtuple('Frame', 'seq timestamp image')
+
+
+class LatestFrame:
+    """Single-slot, latest-frame-wins handoff from one producer to several consumers.
+
+    Buffers come from a fixed pool sized for one held frame per consumer, the
+    published frame and the one being written. The producer only writes into
+    buffers that are neither published nor held, so a consumer can read its
+    frame undisturbed until it calls release().
+    """
+
+    def __init__(self, consumers=2):
+        self.cond = threading.Condition()
+        self.pool_size = consumers + 2
+        self.shape = None
+        self.buffers = []
+        self.holds = {}
+        self.latest = None
+        self.seq = 0
+        self.taken = False
+        self.closed = False
+
+        # Pool allocations, and published frames replaced before anyone took them
+        self.allocs = 0
+        self.dropped = 0
+
+    def acquire(self, shape):
+        """Producer: a free buffer to write the next frame into"""
+        with self.cond:
+            if shape != self.shape:
+                # Resolution changed: consumers keep their old arrays alive until released
+                self.shape, self.buffers, self.holds = shape, [], {}
+            busy = self.latest.image if self.latest else None
+            for buf in self.buffers:
+                if buf is not busy and not self.holds.get(id(buf)):
+                    return buf
+            if len(self.buffers) >= self.pool_size:
+                raise RuntimeError('every frame buffer is held; a consumer is not releasing frames')
+            buf = np.empty(shape, np.uint8)
+            self.buffers.append(buf)
+            self.allocs += 1
+            return buf
+
+    def publish(self, image, timestamp):
+        """Producer: make `image` the newest frame, replacing any untaken one"""
+        with self.cond:
+            if self.latest is not None and not self.taken:
+                self.dropped += 1
+            self.seq += 1
+            self.latest = Frame(self.seq, timestamp, image)
+            self.taken = False
+            self.cond.notify_all()
+
+    def take(self, after=0, timeout=None):
+        """Consumer: hold the newest frame once its seq is past `after`.
+
+        Returns None on timeout (timeout=0 polls) or after close(). Every
+        frame returned must be given back with release().
+        """
+        with self.cond:
+            ready = lambda: self.closed or (self.latest is not None and self.latest.seq > after)
+            if not self.cond.wait_for(ready, timeout) or self.closed:
+                return None
+            frame = self.latest
+            self.holds[id(frame.image)] = self.holds.get(id(frame.image), 0) + 1
+            self.taken = True
+            return frame
+
+    def release(self, image):
+        with self.cond:
+            count = self.holds.get(id(image), 0)
+            if count > 1:
+                self.holds[id(image)] = count - 1
+            else:
+                self.holds.pop(id(image), None)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class SharedFrames:
+    """LatestFrame across processes: the same take()/release() handoff, with the
+    buffer pool in one shared memory block so consumers in another process
+    read frames in place instead of receiving pickled copies.
+
+    The producer creates the block on its first frame, once the camera's real
+    size is known, and consumers attach to it on their first take(); frames
+    keep that size. Bookkeeping (newest slot, seq, timestamp, holds per slot)
+    lives in a small shared array guarded by a multiprocessing Condition, held
+    only to pick, publish or release a slot, never while pixels are copied.
+    Create it before starting the other process and pass it as an argument.
+    """
+    SEQ, LATEST, TIMESTAMP, TAKEN, CLOSED, DROPPED, HEIGHT, WIDTH, HOLDS = range(9)
+    NAME_SIZE = 64
+
+    def __init__(self, consumers=2, context=None):
+        context = context or multiprocessing.get_context('spawn')
+        self.pool_size = consumers + 2
+        self.cond = context.Condition()
+        self.header = context.RawArray('d', self.HOLDS + self.pool_size)
+        self.header[self.LATEST] = -1
+        self.name = context.RawArray('c', self.NAME_SIZE)
+        self.memory = None
+        self.owner = False
+        self.buffers = []
+        self.allocs = 0
+
+    def __getstate__(self):
+        # The block is mapped separately in each process
+        state = dict(self.__dict__, memory=None, owner=False, buffers=[], allocs=0)
+        return state
+
+    @property
+    def seq(self):
+        return int(self.header[self.SEQ])
+
+    @property
+    def dropped(self):
+        return int(self.header[self.DROPPED])
+
+    def map(self, shape):
+        """Create (producer) or attach to (consumer) the block; call under cond"""
+        size = int(np.prod(shape))
+        if self.header[self.HEIGHT]:
+            self.memory = shared_memory.SharedMemory(self.name.value.decode())
+        else:
+            self.memory = shared_memory.SharedMemory(create=True, size=size * self.pool_size)
+            self.name.value = self.memory.name.encode()
+            self.header[self.HEIGHT], self.header[self.WIDTH] = shape[:2]
+            self.owner = True
+            self.allocs += self.pool_size
+        self.buffers = [np.ndarray(shape, np.uint8, self.memory.buf, i * size) for i in range(self.pool_size)]
+
+    def slot(self, image):
+        for i, buf in enumerate(self.buffers):
+            if buf is image:
+                return i
+        raise ValueError('not a buffer of this pool')
+
+    def acquire(self, shape):
+        """Producer: a free slot to write the next frame into"""
+        with self.cond:
+            if not self.buffers:
+                self.map(shape)
+            elif shape != self.buffers[0].shape:
+                raise RuntimeError(f'frame size changed from {self.buffers[0].shape} to {shape}')
+            header = self.header
+            for i, buf in enumerate(self.buffers):
+                if i != header[self.LATEST] and not header[self.HOLDS + i]:
+                    return buf
+            raise RuntimeError('every frame buffer is held; a consumer is not releasing frames')
+
+    def publish(self, image, timestamp):
+        """Producer: make `image` the newest frame, replacing any untaken one"""
+        slot = self.slot(image)
+        with self.cond:
+            header = self.header
+            if header[self.LATEST] >= 0 and not header[self.TAKEN]:
+                header[self.DROPPED] += 1
+            header[self.SEQ] += 1
+            header[self.LATEST] = slot
+            header[self.TIMESTAMP] = timestamp
+            header[self.TAKEN] = 0
+            self.cond.notify_all()
+
+    def take(self, after=0, timeout=None):
+        """Consumer: hold the newest frame once its seq is past `after`; see LatestFrame.take"""
+        header = self.header
+        with self.cond:
+            ready = lambda: header[self.CLOSED] or header[self.SEQ] > after
+            if not self.cond.wait_for(ready, timeout) or header[self.CLOSED]:
+                return None
+            if not self.buffers:
+                self.map((int(header[self.HEIGHT]), int(header[self.WIDTH]), 3))
+            slot = int(header[self.LATEST])
+            header[self.HOLDS + slot] += 1
+            header[self.TAKEN] = 1
+            return Frame(int(header[self.SEQ]), header[self.TIMESTAMP], self.buffers[slot])
+
+    def release(self, image):
+        slot = self.slot(image)
+        with self.cond:
+            if self.header[self.HOLDS + slot] > 0:
+                self.header[self.HOLDS + slot] -= 1
+
+    def close(self):
+        with self.cond:
+            self.header[self.CLOSED] = 1
+            self.cond.notify_all()
+
+    def unmap(self):
+        """Drop this process's mapping; the producer also frees the block"""
+        if self.memory is None:
+            return
+        self.buffers = []
+        try:
+            self.memory.close()
+        except BufferError:
+            # Something (a preview Surface) still exports the memory; it goes with the process
+            pass
+        if self.owner:
+            self.memory.unlink()
+        self.memory = None
+
+
+def open_camera(index=0):
+    """DirectShow first (fast startup on Windows), then the default backend"""
+    cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+    if not cap.isOpened():
+        cap = cv2.VideoCapture(index)
+    return cap
+
+
+class ReplayCapture:
+    """Stands in for cv2.VideoCapture, reading frames from a recorded video.
+
+    With realtime=True frames come out at the file's frame rate, like a live
+    camera; otherwise as fast as they decode. At the end of the file it
+    rewinds if loop=True, else read() fails and `finished` is set.
+    """
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.realtime = realtime
+        self.loop = loop
+        self.next_due = None
+        self.finished = False
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        # Resolution and buffering are whatever was recorded
+        return False
+
+    def read(self, image=None):
+        if self.realtime:
+            now = time.perf_counter()
+            if self.next_due is None or now - self.next_due > 1.0 / self.fps:
+                # First frame, or fell behind: don't burst to catch up
+                self.next_due = now
+            elif self.next_due > now:
+                time.sleep(self.next_due - now)
+            self.next_due += 1.0 / self.fps
+        success, frame = self.cap.read(image)
+        if not success and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.cap.read(image)
+        if not success:
+            self.finished = True
+        return success, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class CameraCapture:
+    """Capture stage: reads, mirrors and converts frames to RGB on its own thread.
+
+    Frames are published to `self.frames` (a LatestFrame); the read and the
+    mirror reuse their buffers, so a steady-state frame costs no allocations.
+    `source` replaces the camera with anything VideoCapture-like, such as a
+    ReplayCapture, and `frames` the LatestFrame (e.g. SharedFrames). While
+    `recorder` is set, every raw frame is passed to it.
+    """
+
+    def __init__(self, width, height, consumers=2, index=0, source=None, frames=None):
+        self.cap = source if source is not None else open_camera(index)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frames = frames if frames is not None else LatestFrame(consumers)
+        self.raw = None
+        self.flipped = None
+        self.recorder = None
+
+        # Full-frame allocations and copies, to check the frame path stays copy-free
+        self.captured = 0
+        self.frame_allocs = 0
+        self.frame_copies = 0
+
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            # Decode into the previous frame's buffer when the backend allows it
+            success, frame = self.cap.read(self.raw)
+            if not success:
+                time.sleep(0.1)
+                continue
+            timestamp = time.perf_counter()
+            self.captured += 1
+            if frame is not self.raw:
+                self.raw = frame
+                self.frame_allocs += 1
+            if self.flipped is None or self.flipped.shape != frame.shape:
+                self.flipped = np.empty_like(frame)
+                self.frame_allocs += 1
+            recorder = self.recorder
+            if recorder:
+                # Single producer: the frame about to be published gets the next seq
+                recorder.frame(frame, self.frames.seq + 1, timestamp)
+
+            cv2.flip(frame, 1, dst=self.flipped)
+            # The only colour conversion: inference and the preview share it
+            rgb = self.frames.acquire(frame.shape)
+            cv2.cvtColor(self.flipped, cv2.COLOR_BGR2RGB, dst=rgb)
+            self.frame_copies += 3
+            self.frames.publish(rgb, timestamp)
+
+    def frame_stats(self):
+        """Average full-frame allocations and copies per captured frame"""
+        n = max(self.captured, 1)
+        return (self.frame_allocs + self.frames.allocs) / n, self.frame_copies / n
+
+    def stop(self):
+        self.running = False
+        self.frames.close()
+        self.thread.join(timeout=1.0)
+        self.cap.release()
+
+
+class SessionRecorder:
+    """Records a live session for replay: the raw camera frames as <prefix>.avi
+    and every hand reading as a line of <prefix>.jsonl.
+
+    Readings carry the index of the video frame they were detected on and the
+    seconds since recording started, so they can be replayed either against
+    the video or on their own.
+    """
+
+    def __init__(self, prefix, fps=30.0):
+        self.prefix = prefix
+        self.fps = fps
+        self.lock = threading.Lock()
+        self.video = None
+        self.lines = open(prefix + '.jsonl', 'w')
+        self.first_seq = None
+        self.start = None
+        self.frames = 0
+        self.readings = 0
+
+    def frame(self, image, seq, timestamp):
+        """Capture thread: append one raw BGR frame"""
+        with self.lock:
+            if self.lines is None:
+                return
+            if self.video is None:
+                h, w = image.shape[:2]
+                self.video = cv2.VideoWriter(self.prefix + '.avi', cv2.VideoWriter_fourcc(*'MJPG'), self.fps, (w, h))
+                self.first_seq, self.start = seq, timestamp
+            self.video.write(image)
+            self.frames += 1
+
+    def reading(self, seq, timestamp, reading):
+        """Inference thread: log the reading (or None) for frame `seq`"""
+        with self.lock:
+            # Frames captured before recording started aren't in the video
+            if self.lines is None or self.first_seq is None or seq < self.first_seq:
+                return
+            row = {'frame': seq - self.first_seq, 't': round(timestamp - self.start, 4)}
+            if reading:
+                row.update(thumb=[round(v, 1) for v in reading.thumb],
+                           index=[round(v, 1) for v in reading.index],
+                           rel_dist=round(reading.rel_dist, 2))
+            self.lines.write(json.dumps(row) + '\n')
+            self.readings += 1
+
+    def close(self):
+        with self.lock:
+            self.lines.close()
+            self.lines = None
+            if self.video:
+                self.video.release()
+
+
+def load_readings(path):
+    """A SessionRecorder .jsonl as a list of (frame, t, HandReading or None)"""
+    readings = []
+    with open(path) as f:
+        for line in f:
+            row = json.loads(line)
+            reading = None
+            if 'rel_dist' in row:
+                reading = HandReading(tuple(row['thumb']), tuple(row['index']), row['rel_dist'])
+            readings.append((row['frame'], row['t'], reading))
+    return readings
+
+
+class OneEuroFilter:
+    """One Euro filter (Casiez et al., CHI 2012): a low-pass whose cutoff rises
+    with speed, so it smooths jitter at rest but adds little lag during fast
+    movement. `velocity` is the filtered rate of change, in units per second.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.02, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value = None
+        self.velocity = 0.0
+        self.t = None
+
+    @staticmethod
+    def alpha(dt, cutoff):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, t):
+        if self.value is None:
+            self.value, self.t = x, t
+            return x
+        # Repeated or out-of-order timestamps: assume a 30 fps step
+        dt = t - self.t if t > self.t else 1 / 30
+        a_d = self.alpha(dt, self.d_cutoff)
+        self.velocity = a_d * (x - self.value) / dt + (1 - a_d) * self.velocity
+        a = self.alpha(dt, self.min_cutoff + self.beta * abs(self.velocity))
+        self.value = a * x + (1 - a) * self.value
+        self.t = t
+        return self.value
+
+
+class PinchDetector:
+    """Scale-normalised pinch with smoothing and hysteresis.
+
+    Readings are the thumb-to-index tip distance as a percentage of hand size.
+    A flap fires once when the smoothed distance drops below TRIGGER and the
+    detector re-arms only after it rises above RELEASE.
+
+    Filters: 'ema' is the original fixed-weight average. 'one_euro' adapts
+    its smoothing to speed. 'predictive' adds a velocity lead to the One
+    Euro value: a closing pinch fires once the distance projected LEAD
+    seconds ahead crosses TRIGGER. It only fires early while still closing
+    and already past halfway from RELEASE to TRIGGER, so fingers that
+    stop just short of a pinch don't set it off.
+    """
+    # GESTURE THRESHOLDS (Recalibrated for Stable Tracking)
+    # These settings match the 'tightness' of the original Pro mode
+    # but work with the more stable Wrist-to-Base measurement.
+    TRIGGER = 45
+    RELEASE = 65
+    FILTERS = ('ema', 'one_euro', 'predictive')
+    LEAD = 0.02
+    PREDICT_BELOW = (TRIGGER + RELEASE) / 2
+
+    def __init__(self, ema_alpha=0.3, filter='ema'):
+        if filter not in self.FILTERS:
+            raise ValueError(f"unknown pinch filter {filter!r}; choose from {', '.join(self.FILTERS)}")
+        self.filter = filter
+        self.ema_alpha = ema_alpha
+        self.one_euro = OneEuroFilter()
+        self.smooth_dist = 0
+        self.is_pinching = False
+
+    def update(self, rel_dist, t=None):
+        """Feed one reading, taken at time t (seconds; needed by the One Euro
+        filters); True when it starts a pinch"""
+        if self.filter == 'ema':
+            if self.smooth_dist == 0: self.smooth_dist = rel_dist
+            self.smooth_dist = (self.ema_alpha * rel_dist) + ((1 - self.ema_alpha) * self.smooth_dist)
+            trigger = self.smooth_dist < self.TRIGGER
+        else:
+            self.smooth_dist = self.one_euro(rel_dist, time.perf_counter() if t is None else t)
+            trigger = self.smooth_dist < self.TRIGGER
+            if self.filter == 'predictive' and not trigger and self.one_euro.velocity < 0:
+                predicted = self.smooth_dist + self.one_euro.velocity * self.LEAD
+                trigger = self.smooth_dist < self.PREDICT_BELOW and predicted < self.TRIGGER
+
+        if trigger:
+            if not self.is_pinching:
+                self.is_pinching = True
+                return True
+        elif self.smooth_dist > self.RELEASE:
+            self.is_pinching = False
+        return False
+
+    @property
+    def zone(self):
+        """'pinch', 'open' or 'between' the two thresholds"""
+        if self.smooth_dist < self.TRIGGER: return 'pinch'
+        if self.smooth_dist > self.RELEASE: return 'open'
+        return 'between'
+
+    @property
+    def near_pinch(self):
+        """Fingers closing or held together: a flap is imminent or under way"""
+        return self.is_pinching or self.smooth_dist < self.RELEASE
+
+
+# Thumb and index tips in frame pixels (for the overlay) and their distance
+# as a percentage of hand size (for PinchDetector)
+HandReading = namedtuple('HandReading', 'thumb index rel_dist')
+
+
+class GestureBackend:
+    """Hand detector behind GestureController: start(), detect(rgb), stop().
+
+    detect() takes a mirrored RGB frame and returns a HandReading, or None
+    when no hand is visible. `infer_time` maps a mode name to [frames,
+    seconds] spent detecting, for the exit summary and benchmarks.
+    """
+    name = None
+
+    def __init__(self):
+        self.infer_time = {}
+
+    def start(self):
+        pass
+
+    def detect(self, rgb):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def timed(self, mode, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        stats = self.infer_time.setdefault(mode, [0, 0.0])
+        stats[0] += 1
+        stats[1] += time.perf_counter() - start
+        return result
+
+
+class MediaPipeBackend(GestureBackend):
+    """MediaPipe Hands landmarks, optionally tracked in a crop around the last hand.
+
+    With roi_tracking, once a hand is found later frames send only a padded
+    crop around it to MediaPipe and fall back to the full frame when it is
+    lost; compare the 'full' and 'roi' timings to see if it pays off. Crops
+    go to a second Hands in static image mode: each crop has its own offset,
+    so MediaPipe's own tracking (which keeps the hand's region in the last
+    image's coordinates) would look in the wrong place. Full frames keep a
+    tracking Hands of their own.
+    """
+    name = 'mediapipe'
+
+    def __init__(self, roi_tracking=False, roi_pad=0.5, roi_min_size=96, model_complexity=0,
+                 min_detection_confidence=0.5):
+        super().__init__()
+        self.min_detection_confidence = min_detection_confidence
+        self.roi_tracking = roi_tracking
+        self.roi_pad = roi_pad
+        self.roi_min_size = roi_min_size
+        self.model_complexity = model_complexity
+        self.hands = None
+        self.crop_hands = None
+        # Crop box (x0, y0, x1, y1), or None for the full frame
+        self.roi = None
+
+    def start(self):
+        import mediapipe as mp
+        options = dict(max_num_hands=1, min_detection_confidence=self.min_detection_confidence,
+                       min_tracking_confidence=0.5, model_complexity=self.model_complexity)
+        self.hands = mp.solutions.hands.Hands(**options)
+        if self.roi_tracking:
+            self.crop_hands = mp.solutions.hands.Hands(static_image_mode=True, **options)
+
+    def detect(self, rgb):
+        h, w, _ = rgb.shape
+        results, to_pixels = self.process(rgb, self.roi)
+        if not results.multi_hand_landmarks and self.roi is not None:
+            # Hand left the crop: search the whole frame before giving up
+            self.roi = None
+            results, to_pixels = self.process(rgb, None)
+        if not results.multi_hand_landmarks:
+            return None
+
+        lm = results.multi_hand_landmarks[0]
+        if self.roi_tracking:
+            self.roi = self.next_roi([to_pixels(p) for p in lm.landmark], w, h)
+
+        # Tips: 4 (Thumb), 8 (Index)
+        # Base for scale: 0 (Wrist), 5 (Index Base/MCP)
+        p_thumb = to_pixels(lm.landmark[4])
+        p_index = to_pixels(lm.landmark[8])
+        p_wrist = to_pixels(lm.landmark[0])
+        p_base = to_pixels(lm.landmark[5])
+
+        # Distance between tips
+        dist = math.hypot(p_thumb[0] - p_index[0], p_thumb[1] - p_index[1])
+
+        # Scale normalization: using distance from wrist to index base as hand size
+        hand_size = math.hypot(p_wrist[0] - p_base[0], p_wrist[1] - p_base[1])
+        if hand_size == 0: hand_size = 1
+
+        # Relative distance (percentage of hand size)
+        return HandReading(p_thumb, p_index, (dist / hand_size) * 100)
+
+    def process(self, rgb, roi):
+        """Run MediaPipe on the frame or a crop of it; returns the results and a
+        function mapping a landmark to full-frame pixel coordinates"""
+        h, w, _ = rgb.shape
+        if roi is None:
+            x0, y0, cw, ch = 0, 0, w, h
+            image, mode = rgb, 'full'
+        else:
+            x0, y0, x1, y1 = roi
+            cw, ch = x1 - x0, y1 - y0
+            # MediaPipe needs contiguous memory; the crop is a fraction of the frame
+            image, mode = np.ascontiguousarray(rgb[y0:y1, x0:x1]), 'roi'
+
+        hands = self.hands if roi is None else self.crop_hands
+        results = self.timed(mode, hands.process, image)
+        return results, lambda p: (x0 + p.x * cw, y0 + p.y * ch)
+
+    def next_roi(self, points, w, h):
+        """Square crop around the hand's landmarks, padded so it can move between frames"""
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        size = max(max(xs) - min(xs), max(ys) - min(ys)) * (1 + 2 * self.roi_pad)
+        size = max(size, self.roi_min_size)
+        cx, cy = (max(xs) + min(xs)) / 2, (max(ys) + min(ys)) / 2
+        x0, x1 = int(max(0, cx - size / 2)), int(min(w, cx + size / 2))
+        y0, y1 = int(max(0, cy - size / 2)), int(min(h, cy + size / 2))
+        # Crop would cover most of the frame anyway, or got clipped to a sliver
+        if (x1 - x0) * (y1 - y0) > 0.6 * w * h or min(x1 - x0, y1 - y0) < self.roi_min_size // 2:
+            return None
+        return (x0, y0, x1, y1)
+
+    def stop(self):
+        if self.hands: self.hands.close()
+        if self.crop_hands: self.crop_hands.close()
+
+
+class SkinPinchBackend(GestureBackend):
+    """Classical skin-mask pinch detector for machines too slow for MediaPipe.
+
+    Skin pixels are segmented in YCrCb at half resolution and the largest blob
+    with a finger gap is taken as the hand. The deepest convexity defect is
+    the thumb-index valley; its two flanking hull points stand in for the
+    tips. A closed pinch encloses a hole in the blob, which reads as distance
+    0. Works best with the hand nearer the camera than the face and a
+    background that isn't skin-coloured.
+    """
+    name = 'skin'
+
+    # Chai & Ngan skin range in YCrCb
+    SKIN_LOW = np.array([0, 133, 77], np.uint8)
+    SKIN_HIGH = np.array([255, 173, 127], np.uint8)
+    SCALE = 2
+    # Blob and hole sizes as fractions of the frame and of the hand
+    MIN_HAND_AREA = 0.02
+    MIN_HOLE_AREA = 0.01
+    # Deepest valley must be this deep, relative to hand size, to count as fingers
+    MIN_VALLEY_DEPTH = 0.25
+    # sqrt(blob area) to MediaPipe's wrist-to-index-base length
+    HAND_SIZE_RATIO = 0.9
+
+    def __init__(self):
+        super().__init__()
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.small = None
+        self.ycrcb = None
+        self.mask = None
+
+    def detect(self, rgb):
+        return self.timed('full', self.find_pinch, rgb)
+
+    def find_pinch(self, rgb):
+        h, w, _ = rgb.shape
+        size = (w // self.SCALE, h // self.SCALE)
+        if self.small is None or self.small.shape[1::-1] != size:
+            self.small = np.empty((size[1], size[0], 3), np.uint8)
+            self.ycrcb = np.empty_like(self.small)
+            self.mask = np.empty(self.small.shape[:2], np.uint8)
+        cv2.resize(rgb, size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_RGB2YCrCb, dst=self.ycrcb)
+        cv2.inRange(self.ycrcb, self.SKIN_LOW, self.SKIN_HIGH, dst=self.mask)
+        cv2.morphologyEx(self.mask, cv2.MORPH_OPEN, self.kernel, dst=self.mask)
+        cv2.morphologyEx(self.mask, cv2.MORPH_CLOSE, self.kernel, dst=self.mask, iterations=2)
+
+        contours, hierarchy = cv2.findContours(self.mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+        if hierarchy is None:
+            return None
+        hierarchy = hierarchy[0]
+        min_area = self.MIN_HAND_AREA * size[0] * size[1]
+        outer = [(cv2.contourArea(c), i) for i, c in enumerate(contours) if hierarchy[i][3] < 0]
+        for area, i in sorted(outer, reverse=True):
+            if area < min_area:
+                break
+            reading = self.read_hand(contours, hierarchy, i, area)
+            if reading:
+                return reading
+        return None
+
+    def read_hand(self, contours, hierarchy, i, area):
+        """HandReading for blob i, or None if it has no finger gap (a face, an arm)"""
+        contour = contours[i]
+        hand_size = self.HAND_SIZE_RATIO * math.sqrt(area)
+        to_pixels = lambda p: (float(p[0]) * self.SCALE, float(p[1]) * self.SCALE)
+
+        # Thumb touching index closes a loop: a hole inside the hand blob
+        child = hierarchy[i][2]
+        while child >= 0:
+            hole = contours[child]
+            if cv2.contourArea(hole) > self.MIN_HOLE_AREA * area:
+                m = cv2.moments(hole)
+                if m['m00']:
+                    centre = to_pixels((m['m10'] / m['m00'], m['m01'] / m['m00']))
+                    return HandReading(centre, centre, 0.0)
+            child = hierarchy[child][0]
+
+        if len(contour) < 5:
+            return None
+        hull = cv2.convexHull(contour, returnPoints=False)
+        try:
+            defects = cv2.convexityDefects(contour, hull)
+        except cv2.error:
+            # Self-intersecting contours make the hull indices non-monotonic
+            return None
+        if defects is None:
+            return None
+        start, end, _, depth = max(defects.reshape(-1, 4), key=lambda d: d[3])
+        if depth / 256.0 < self.MIN_VALLEY_DEPTH * hand_size:
+            return None
+        thumb, index = to_pixels(contour[start][0]), to_pixels(contour[end][0])
+        dist = math.hypot(thumb[0] - index[0], thumb[1] - index[1]) / self.SCALE
+        return HandReading(thumb, index, dist / hand_size * 100)
+
+
+class ReplayBackend(GestureBackend):
+    """Plays back readings recorded by SessionRecorder instead of detecting.
+
+    With realtime=True each call returns the reading that was current at the
+    same time into the recording, whatever is driving detect(); otherwise
+    each call returns the next reading. At the end it rewinds if loop=True,
+    else it returns None and sets `finished`.
+    """
+    name = 'replay'
+
+    def __init__(self, path, realtime=True, loop=False):
+        super().__init__()
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.readings = []
+        self.pos = 0
+        self.started = None
+        self.finished = False
+
+    def start(self):
+        self.readings = load_readings(self.path)
+        self.finished = not self.readings
+
+    def detect(self, rgb):
+        return self.timed('full', self.next_reading)
+
+    def next_reading(self):
+        if self.finished:
+            return None
+        if not self.realtime:
+            reading = self.readings[self.pos][2]
+            self.pos += 1
+            self.finished = self.pos >= len(self.readings) and not self.loop
+            self.pos %= len(self.readings)
+            return reading
+
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        elapsed = now - self.started
+        while self.pos + 1 < len(self.readings) and self.readings[self.pos + 1][1] <= elapsed:
+            self.pos += 1
+        if self.pos + 1 >= len(self.readings) and elapsed > self.readings[-1][1]:
+            if self.loop:
+                self.pos, self.started = 0, now
+            else:
+                self.finished = True
+        return self.readings[self.pos][2]
+
+
+BACKENDS = {backend.name: backend for backend in (MediaPipeBackend, SkinPinchBackend, ReplayBackend)}
+
+
+def make_backend(name, **options):
+    """Instantiate and start a backend by name; options go to its constructor"""
+    if name not in BACKENDS:
+        raise ValueError(f"unknown gesture backend {name!r}; choose from {', '.join(BACKENDS)}")
+    backend = BACKENDS[name](**options)
+    backend.start()
+    return backend
+
+
+class LatencyTracker:
+    """Timestamps a flap from camera capture to the display flip that shows it.
+
+    Stages, all time.perf_counter() seconds: the frame was captured, inference
+    on it finished, the flap flag was set, the game loop consumed the flag,
+    and the next display flip. Rolling windows feed the on-screen histogram;
+    every completed flap is also kept (up to MAX_LOG) for CSV export.
+    """
+    STAGES = ('captured', 'inferred', 'flagged', 'consumed', 'flipped')
+    MAX_LOG = 100000
+
+    def __init__(self, window=300):
+        self.lock = threading.Lock()
+        self.frame_ages = deque(maxlen=window)
+        self.flaps = deque(maxlen=window)
+        self.log = []
+        self.pending = None
+        self.shown = []
+
+    def inferred(self, captured, done):
+        """Every inferred frame: how old the frame was when its result was ready"""
+        # Under the lock: stage_times() copies the deque from the game thread
+        with self.lock:
+            self.frame_ages.append(done - captured)
+
+    def flagged(self, captured, inferred, flagged, **extra):
+        with self.lock:
+            # A flag the game hasn't consumed yet already stands for this flap
+            if self.pending is None:
+                self.pending = dict(extra, captured=captured, inferred=inferred, flagged=flagged)
+
+    def consumed(self, when):
+        with self.lock:
+            if self.pending is not None:
+                self.pending['consumed'] = when
+                self.shown.append(self.pending)
+                self.pending = None
+
+    def flipped(self, when):
+        """Call right after display.flip(); completes the flaps consumed this frame"""
+        with self.lock:
+            done, self.shown = self.shown, []
+        for event in done:
+            event['flipped'] = when
+            self.flaps.append(event)
+            if len(self.log) < self.MAX_LOG:
+                self.log.append(event)
+
+    def stage_times(self):
+        """{stage: (p50_ms, p95_ms)} over the window, for each step and end to end"""
+        with self.lock:
+            ages = list(self.frame_ages)
+        flaps = list(self.flaps)
+        spans = {'frame age': [a * 1000 for a in ages]}
+        for start, end in zip(self.STAGES, self.STAGES[1:]):
+            spans[f'{start}->{end}'] = [(f[end] - f[start]) * 1000 for f in flaps]
+        spans['total'] = [(f['flipped'] - f['captured']) * 1000 for f in flaps]
+        result = {}
+        for name, values in spans.items():
+            values.sort()
+            if values:
+                result[name] = (values[len(values) // 2], values[min(len(values) - 1, int(len(values) * 0.95))])
+        return result
+
+    def histogram(self, bin_ms=10, bins=20):
+        """Counts of end-to-end flap latency per bin; the last bin collects the tail"""
+        counts = [0] * bins
+        for f in list(self.flaps):
+            counts[min(bins - 1, int((f['flipped'] - f['captured']) * 1000 // bin_ms))] += 1
+        return counts
+
+    def write_csv(self, path):
+        """Write every completed flap, one row each, with per-stage latencies in ms"""
+        with self.lock:
+            rows = list(self.log)
+        extra = sorted({key for row in rows for key in row} - set(self.STAGES))
+        spans = list(zip(self.STAGES, self.STAGES[1:]))
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(self.STAGES) + [f'{a}_{b}_ms' for a, b in spans] + ['total_ms'] + extra)
+            for row in rows:
+                writer.writerow(
+                    [f"{row[s]:.6f}" for s in self.STAGES]
+                    + [f"{(row[b] - row[a]) * 1000:.2f}" for a, b in spans]
+                    + [f"{(row['flipped'] - row['captured']) * 1000:.2f}"]
+                    + [row.get(key, '') for key in extra]
+                )
+        return len(rows)
+
+
+class GestureThread:
+    """The inference loop on its own thread: newest frame, backend, PinchDetector, flap flag.
+
+    Each pass takes the newest frame from `camera`, detects on it and hands
+    the buffer back straight away, so the render loop only ever reads a flag
+    and the latest reading. `pace(work_seconds, near_pinch)` returns how long
+    to wait before the next detection (fp.py's RateGovernor); without it the
+    loop detects on every new frame. `flap_info()` adds fields to each
+    flap's latency record, and readings go to `recorder` while one is set.
+    """
+
+    def __init__(self, camera, backend, pinch, latency=None, pace=None, flap_info=None):
+        self.camera = camera
+        self.backend = backend
+        self.pinch = pinch
+        self.latency = latency
+        self.pace = pace
+        self.flap_info = flap_info
+        self.recorder = None
+        self.lock = threading.Lock()
+        self.flap = False
+        # (HandReading, smoothed distance, zone) from the last detection; None without a hand
+        self.hand = None
+
+        # Frames inference ran on vs. frames the camera delivered meanwhile
+        self.inferred = 0
+        self.skipped = 0
+
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        frames = self.camera.frames
+        last_seq = 0
+        while self.running:
+            frame = frames.take(last_seq, timeout=0.5)
+            if frame is None: continue
+            started = time.perf_counter()
+            if last_seq: self.skipped += frame.seq - last_seq - 1
+            last_seq = frame.seq
+            self.inferred += 1
+
+            reading = self.backend.detect(frame.image)
+            # Only the reading is needed from here on; the preview may still hold the frame
+            frames.release(frame.image)
+            inferred = time.perf_counter()
+            if self.latency: self.latency.inferred(frame.timestamp, inferred)
+            recorder = self.recorder
+            if recorder: recorder.reading(frame.seq, frame.timestamp, reading)
+
+            flap = False
+            hand = None
+            if reading:
+                flap = self.pinch.update(reading.rel_dist, frame.timestamp)
+                hand = (reading, self.pinch.smooth_dist, self.pinch.zone)
+
+            with self.lock:
+                self.hand = hand
+                if flap:
+                    self.flap = True
+                    if self.latency:
+                        self.latency.flagged(frame.timestamp, inferred, time.perf_counter(),
+                                             **(self.flap_info() if self.flap_info else {}))
+
+            if self.pace:
+                # Sleep off the rest of the interval instead of spinning
+                time.sleep(self.pace(time.perf_counter() - started, bool(reading) and self.pinch.near_pinch))
+
+    def take_flap(self):
+        """True once per pinch, for the render loop"""
+        with self.lock:
+            flap, self.flap = self.flap, False
+            if flap and self.latency: self.latency.consumed(time.perf_counter())
+        return flap
+
+    def stop(self):
+        """Let an in-flight detection finish; the camera and backend are the caller's"""
+        self.running = False
+        self.thread.join(timeout=1.0)
+
+
+def inference_summary(camera, backend, inferred, skipped):
+    """Exit report lines for a capture + inference loop"""
+    allocs, copies = camera.frame_stats()
+    lines = [f"Camera path: {camera.captured} frames, {allocs:.3f} allocations and {copies:.2f} copies per frame",
+             f"Inference: ran on {inferred} frames, {skipped} newer frames superseded older ones"]
+    for mode, (count, seconds) in backend.infer_time.items():
+        if count: lines.append(f"Inference ({backend.name} {mode}): {count} frames, {seconds / count * 1000:.2f} ms per frame")
+    return lines
+
+
+# Latest detection as seen by the game process; flap is (captured, inferred,
+# flagged) when a pinch started since the previous poll
+Detection = namedtuple('Detection', 'seq captured inferred work reading smooth_dist zone near_pinch flap')
+
+
+class InferenceProcess:
+    """Capture, hand detection and PinchDetector in a worker process.
+
+    MediaPipe and the OpenCV conversions then run on another interpreter and
+    never take the GIL from the render loop. Frames come back through
+    SharedFrames for the preview. The latest reading and a running flap count
+    go through a small shared array written only by the worker and read
+    without locks: the worker bumps VERSION to odd before an update and to
+    even after, and poll() retries a read that straddled one. The game sends
+    the wait between detections back the same way, and recording on/off
+    over a queue. perf_counter() is a system-wide monotonic clock, so
+    timestamps from both processes compare directly.
+    """
+    (VERSION, SEQ, CAPTURED, INFERRED, WORK, HAND, THUMB_X, THUMB_Y, INDEX_X, INDEX_Y, REL_DIST,
+     SMOOTH_DIST, ZONE, NEAR, FLAPS, FLAP_CAPTURED, FLAP_INFERRED, FLAP_FLAGGED) = range(18)
+    WAIT, RUNNING = range(2)
+    ZONES = ('pinch', 'open', 'between')
+
+    def __init__(self, width, height, backend, backend_options=None, pinch_filter='ema', replay=None, consumers=1):
+        context = multiprocessing.get_context('spawn')
+        # Consumers here plus the worker's inference
+        self.frames = SharedFrames(consumers + 1, context)
+        self.state = context.RawArray('d', 18)
+        self.control = context.RawArray('d', [1.0 / 30, 1])
+        self.commands = context.Queue()
+        self.seen_seq = 0
+        self.seen_flaps = 0
+        self.process = context.Process(
+            target=inference_worker, name='gesture-inference', daemon=True,
+            args=(self.frames, self.state, self.control, self.commands, width, height,
+                  backend, backend_options or {}, pinch_filter, replay))
+        self.start()
+
+    def start(self):
+        # The spawned child re-imports the parent's __main__ before running
+        # inference_worker, so the game scripts keep their window and game
+        # loop under `if __name__ == '__main__':`
+        self.process.start()
+
+    def snapshot(self):
+        state = self.state
+        while True:
+            version = state[self.VERSION]
+            if version % 2 == 0:
+                values = state[:]
+                if state[self.VERSION] == version:
+                    return values
+            time.sleep(0)
+
+    def poll(self):
+        """The newest detection if there is one since the last poll, else None"""
+        values = self.snapshot()
+        if values[self.SEQ] == self.seen_seq:
+            return None
+        self.seen_seq = values[self.SEQ]
+        reading = None
+        if values[self.HAND]:
+            reading = HandReading((values[self.THUMB_X], values[self.THUMB_Y]),
+                                  (values[self.INDEX_X], values[self.INDEX_Y]), values[self.REL_DIST])
+        flap = None
+        if values[self.FLAPS] != self.seen_flaps:
+            self.seen_flaps = values[self.FLAPS]
+            flap = (values[self.FLAP_CAPTURED], values[self.FLAP_INFERRED], values[self.FLAP_FLAGGED])
+        return Detection(int(values[self.SEQ]), values[self.CAPTURED], values[self.INFERRED], values[self.WORK],
+                         reading, values[self.SMOOTH_DIST], self.ZONES[int(values[self.ZONE])], bool(values[self.NEAR]), flap)
+
+    def set_wait(self, seconds):
+        """Seconds the worker sleeps after each detection"""
+        self.control[self.WAIT] = seconds
+
+    def record(self, prefix):
+        """Start recording to prefix.avi/.jsonl, or stop with None"""
+        self.commands.put(prefix)
+
+    def stop(self, timeout=5.0):
+        """Stop the worker (it prints its own summary) and unmap the frames"""
+        self.control[self.RUNNING] = 0
+        self.frames.close()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.frames.unmap()
+
+
+def inference_worker(frames, state, control, commands, width, height, backend, backend_options, pinch_filter, replay):
+    """InferenceProcess body: the threaded controller's capture, detect and pinch loop"""
+    fields = InferenceProcess
+    source = ReplayCapture(replay, loop=True) if replay else None
+    camera = CameraCapture(width, height, source=source, frames=frames)
+    detector = make_backend(backend, **backend_options)
+    pinch = PinchDetector(filter=pinch_filter)
+    recorder = None
+    flaps = inferred = skipped = 0
+    flap_times = (0.0, 0.0, 0.0)
+    last_seq = 0
+
+    while control[fields.RUNNING]:
+        try:
+            prefix = commands.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            if recorder:
+                camera.recorder = None
+                recorder.close()
+                print(f"Recorded {recorder.frames} frames and {recorder.readings} readings to {recorder.prefix}.avi/.jsonl")
+            recorder = SessionRecorder(prefix, fps=camera.fps) if prefix else None
+            camera.recorder = recorder
+
+        frame = frames.take(last_seq, timeout=0.5)
+        if frame is None: continue
+        started = time.perf_counter()
+        if last_seq: skipped += frame.seq - last_seq - 1
+        last_seq = frame.seq
+        inferred += 1
+
+        reading = detector.detect(frame.image)
+        frames.release(frame.image)
+        done = time.perf_counter()
+        if recorder: recorder.reading(frame.seq, frame.timestamp, reading)
+
+        hand = (0.0,) * 6
+        if reading:
+            if pinch.update(reading.rel_dist, frame.timestamp):
+                flaps += 1
+                flap_times = (frame.timestamp, done, time.perf_counter())
+            hand = (1.0, *reading.thumb, *reading.index, reading.rel_dist)
+        values = [frame.seq, frame.timestamp, done, time.perf_counter() - started, *hand, pinch.smooth_dist,
+                  fields.ZONES.index(pinch.zone), bool(reading) and pinch.near_pinch, flaps, *flap_times]
+        state[fields.VERSION] += 1
+        state[fields.SEQ:] = values
+        state[fields.VERSION] += 1
+
+        time.sleep(max(0.002, control[fields.WAIT]))
+
+    if recorder: recorder.close()
+    camera.stop()
+    detector.stop()
+    for line in inference_summary(camera, detector, inferred, skipped):
+        print(line)
+    frames.unmap()
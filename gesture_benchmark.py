@@ -0,0 +1,341 @@
+"""Headless gesture benchmark: compare backends and check flap behaviour on
+recorded or live footage, no game window needed.
+
+    python gesture_benchmark.py --video recordings/session-20240101-120000.avi
+    python gesture_benchmark.py --landmarks recordings/session-20240101-120000.jsonl --events
+    python gesture_benchmark.py --camera 0 --frames 300 --backends mediapipe skin
+
+Record sessions with F4 in fp.py. Every video frame is mirrored and
+converted to RGB exactly as the capture stage does, then handed to each
+backend in turn; --landmarks replays the recorded hand readings instead of
+running a detector. Each backend feeds its own PinchDetector.
+
+By default frames are processed one after another as fast as possible, so
+results are deterministic for a given file. --realtime paces the source at
+its recorded rate and, like the live pipeline, skips frames that arrive
+while the backends are still busy.
+
+The report gives frames per second, wall and CPU time per frame (CPU
+includes the backend's worker threads), how often a hand was found, and
+agreement with the first backend: hand present or not, pinch state, and
+the mean difference in pinch distance when both saw a hand. A second table
+shows the hysteresis: flaps, releases, dips back below TRIGGER that the
+hysteresis absorbed, and time spent in each zone.
+
+--filters replays each backend's distance readings through every listed
+pinch filter (see PinchDetector) and scores their flaps against reference
+pinches taken from the raw, unfiltered distances. A flap is a hit if it
+lands in a reference pinch or up to EARLY_WINDOW before one starts; other
+flaps are false triggers. Latency is flap time minus reference start, so
+negative means the filter fired before the raw distance crossed TRIGGER.
+"""
+import argparse
+import json
+import time
+
+import cv2
+
+from gesture import BACKENDS, PinchDetector, ReplayBackend, make_backend
+
+# Reference pinch: this many raw readings in a row below TRIGGER
+DEBOUNCE = 2
+# How far ahead of a reference pinch a flap still counts as a hit
+EARLY_WINDOW = 0.2
+
+
+class BackendRun:
+    """Per-backend counters for one benchmark"""
+
+    def __init__(self, name, backend, pinch_filter='ema'):
+        self.name = name
+        self.backend = backend
+        self.pinch = PinchDetector(filter=pinch_filter)
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.frames = 0
+        self.found = 0
+        # Agreement with the reference backend
+        self.same_presence = 0
+        self.same_pinch = 0
+        self.both_found = 0
+        self.dist_error = 0.0
+        # Hysteresis: flap times, releases, absorbed re-triggers, frames per zone
+        self.flaps = []
+        self.releases = 0
+        self.absorbed = 0
+        self.zones = {'pinch': 0, 'between': 0, 'open': 0}
+        self.reached_pinch = False
+        # (t, rel_dist) of every reading, for replaying through other filters
+        self.trace = []
+
+    def step(self, rgb, t):
+        wall, cpu = time.perf_counter(), time.process_time()
+        reading = self.backend.detect(rgb)
+        self.wall += time.perf_counter() - wall
+        self.cpu += time.process_time() - cpu
+        self.frames += 1
+        if reading:
+            self.found += 1
+            self.trace.append((t, reading.rel_dist))
+            was_pinching, was_zone = self.pinch.is_pinching, self.pinch.zone
+            if self.pinch.update(reading.rel_dist, t):
+                self.flaps.append(t)
+                self.reached_pinch = False
+            zone = self.pinch.zone
+            self.zones[zone] += 1
+            if was_pinching and not self.pinch.is_pinching:
+                self.releases += 1
+            elif was_pinching and self.reached_pinch and was_zone == 'between' and zone == 'pinch':
+                # Dipped below TRIGGER again without passing RELEASE: no second flap
+                self.absorbed += 1
+            self.reached_pinch = self.reached_pinch or zone == 'pinch'
+        return reading
+
+    def compare(self, reading, reference, ref_reading):
+        self.same_presence += (reading is None) == (ref_reading is None)
+        self.same_pinch += self.pinch.is_pinching == reference.pinch.is_pinching
+        if reading and ref_reading:
+            self.both_found += 1
+            self.dist_error += abs(reading.rel_dist - ref_reading.rel_dist)
+
+    def summary(self):
+        n = max(self.frames, 1)
+        hand_frames = max(sum(self.zones.values()), 1)
+        gaps = [b - a for a, b in zip(self.flaps, self.flaps[1:])]
+        return {
+            'frames': self.frames,
+            'wall_ms': self.wall / n * 1000,
+            'cpu_ms': self.cpu / n * 1000,
+            'hand_pct': self.found / n * 100,
+            'presence_agree_pct': self.same_presence / n * 100,
+            'pinch_agree_pct': self.same_pinch / n * 100,
+            'dist_error': self.dist_error / self.both_found if self.both_found else None,
+            'flaps': len(self.flaps),
+            'releases': self.releases,
+            'absorbed': self.absorbed,
+            'min_flap_gap_s': min(gaps) if gaps else None,
+            'zone_pct': {zone: count / hand_frames * 100 for zone, count in self.zones.items()},
+            'flap_times': [round(t, 4) for t in self.flaps],
+        }
+
+
+def reference_pinches(trace):
+    """[(start, end)] pinches in the raw distances: closed once DEBOUNCE readings
+    in a row are below TRIGGER (start is the first of them), open above RELEASE"""
+    events, below, start, closed = [], 0, None, False
+    for t, dist in trace:
+        if closed:
+            if dist > PinchDetector.RELEASE:
+                events.append((start, t))
+                closed, below = False, 0
+        elif dist < PinchDetector.TRIGGER:
+            below += 1
+            if below == 1:
+                start = t
+            closed = below >= DEBOUNCE
+        else:
+            below = 0
+    if closed:
+        events.append((start, trace[-1][0]))
+    return events
+
+
+def compare_filters(trace, filters):
+    """Replay a distance trace through each pinch filter and score its flaps"""
+    events = reference_pinches(trace)
+    results = {}
+    for name in filters:
+        pinch = PinchDetector(filter=name)
+        flaps = [t for t, dist in trace if pinch.update(dist, t)]
+        hit, latencies, false = set(), [], 0
+        for flap in flaps:
+            match = next((i for i, (start, end) in enumerate(events)
+                          if i not in hit and start - EARLY_WINDOW <= flap <= end), None)
+            if match is None:
+                false += 1
+            else:
+                hit.add(match)
+                latencies.append((flap - events[match][0]) * 1000)
+        latencies.sort()
+        results[name] = {
+            'flaps': len(flaps),
+            'hits': len(hit),
+            'false': false,
+            'missed': len(events) - len(hit),
+            'latency_p50_ms': latencies[len(latencies) // 2] if latencies else None,
+            'latency_p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+            'latency_mean_ms': sum(latencies) / len(latencies) if latencies else None,
+        }
+    return len(events), results
+
+
+def report_filters(runs, filters):
+    results = {}
+    for run in runs:
+        count, rows = compare_filters(run.trace, filters)
+        results[run.name] = rows
+        print()
+        print(f"{run.name}: {count} reference pinches (raw distance, {DEBOUNCE} readings under TRIGGER)")
+        print(f"{'filter':<12}{'flaps':>7}{'hits':>6}{'false':>7}{'missed':>8}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}")
+        for name, row in rows.items():
+            cells = [f"{row[key]:.1f}" if row[key] is not None else '-'
+                     for key in ('latency_p50_ms', 'latency_p95_ms', 'latency_mean_ms')]
+            print(f"{name:<12}{row['flaps']:>7}{row['hits']:>6}{row['false']:>7}{row['missed']:>8}"
+                  f"{cells[0]:>9}{cells[1]:>9}{cells[2]:>9}")
+    return results
+
+
+class FrameSource:
+    """Yields (t, rgb) from a video file or camera; t is seconds into the footage.
+
+    With realtime, a file is paced at its frame rate and frames that fall
+    due while the caller is busy are skipped (counted in `dropped`).
+    """
+
+    def __init__(self, source, limit=None, realtime=False):
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise SystemExit(f"could not open {source!r}")
+        self.live = isinstance(source, int)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.limit = limit
+        self.realtime = realtime and not self.live
+        self.dropped = 0
+
+    def __iter__(self):
+        index = count = 0
+        started = time.perf_counter()
+        try:
+            while self.limit is None or count < self.limit:
+                if self.realtime:
+                    # Newest frame wins: skip whatever came due while we were busy
+                    due = int((time.perf_counter() - started) * self.fps)
+                    while index < due and self.cap.grab():
+                        index += 1
+                        self.dropped += 1
+                    wait = started + index / self.fps - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                success, frame = self.cap.read()
+                if not success:
+                    break
+                t = time.perf_counter() - started if self.live else index / self.fps
+                index += 1
+                count += 1
+                yield t, cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+        finally:
+            self.cap.release()
+
+
+class ReadingSource:
+    """Yields (t, None) once per recorded reading, for the replay backend to consume.
+
+    With realtime, readings come out at their recorded times, skipping any
+    that fall due while the caller is busy.
+    """
+
+    def __init__(self, backend, limit=None, realtime=False):
+        self.backend = backend
+        self.limit = limit
+        self.realtime = realtime
+        self.dropped = 0
+
+    def __iter__(self):
+        readings = self.backend.readings
+        started = time.perf_counter()
+        count = 0
+        while self.backend.pos < len(readings) and not self.backend.finished:
+            if self.limit is not None and count >= self.limit:
+                break
+            t = readings[self.backend.pos][1]
+            if self.realtime:
+                elapsed = time.perf_counter() - started
+                while self.backend.pos + 1 < len(readings) and readings[self.backend.pos + 1][1] <= elapsed:
+                    self.backend.pos += 1
+                    self.dropped += 1
+                t = readings[self.backend.pos][1]
+                if t > elapsed:
+                    time.sleep(t - elapsed)
+            count += 1
+            yield t, None
+
+
+def report(runs, elapsed, dropped):
+    print(f"{'backend':<12}{'frames':>8}{'fps':>10}{'wall ms':>9}{'cpu ms':>9}{'hand %':>8}"
+          f"{'agree %':>9}{'pinch %':>9}{'dist err':>10}")
+    results = {}
+    for run in runs:
+        row = results[run.name] = run.summary()
+        row['fps'] = row['frames'] / elapsed if elapsed else 0.0
+        error = f"{row['dist_error']:.1f}" if row['dist_error'] is not None else '-'
+        print(f"{run.name:<12}{row['frames']:>8}{row['fps']:>10.1f}{row['wall_ms']:>9.2f}{row['cpu_ms']:>9.2f}"
+              f"{row['hand_pct']:>8.1f}{row['presence_agree_pct']:>9.1f}{row['pinch_agree_pct']:>9.1f}{error:>10}")
+    if dropped:
+        print(f"{dropped} frames skipped because the backends were still busy")
+
+    print()
+    print(f"hysteresis: TRIGGER {PinchDetector.TRIGGER}, RELEASE {PinchDetector.RELEASE}")
+    print(f"{'backend':<12}{'flaps':>7}{'release':>9}{'absorbed':>10}{'min gap s':>11}{'pinch %':>9}{'between %':>11}{'open %':>8}")
+    for run in runs:
+        row = results[run.name]
+        gap = f"{row['min_flap_gap_s']:.3f}" if row['min_flap_gap_s'] is not None else '-'
+        zones = row['zone_pct']
+        print(f"{run.name:<12}{row['flaps']:>7}{row['releases']:>9}{row['absorbed']:>10}{gap:>11}"
+              f"{zones['pinch']:>9.1f}{zones['between']:>11.1f}{zones['open']:>8.1f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless gesture benchmark on recorded or live footage')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help='video file to read frames from')
+    source.add_argument('--camera', type=int, help='camera index to read frames from')
+    source.add_argument('--landmarks', help='recorded .jsonl hand readings to replay instead of detecting')
+    parser.add_argument('--frames', type=int, help='stop after this many frames')
+    parser.add_argument('--backends', nargs='+', choices=sorted(set(BACKENDS) - {'replay'}), default=['mediapipe', 'skin'],
+                        help='the first one is the reference for agreement')
+    parser.add_argument('--roi', action='store_true', help='enable ROI tracking in the mediapipe backend')
+    parser.add_argument('--realtime', action='store_true', help='pace the source at its recorded rate, skipping frames while busy')
+    parser.add_argument('--filters', nargs='+', choices=PinchDetector.FILTERS, default=['ema'],
+                        help='pinch filters to compare; the first drives the main tables')
+    parser.add_argument('--events', action='store_true', help='list the time of every flap')
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON, for comparing runs')
+    args = parser.parse_args()
+
+    runs = []
+    if args.landmarks:
+        replay = ReplayBackend(args.landmarks, realtime=False)
+        replay.start()
+        runs.append(BackendRun('replay', replay, args.filters[0]))
+        frames = ReadingSource(replay, args.frames, args.realtime)
+    else:
+        for name in args.backends:
+            options = {'roi_tracking': args.roi} if name == 'mediapipe' else {}
+            runs.append(BackendRun(name, make_backend(name, **options), args.filters[0]))
+        frames = FrameSource(args.video if args.video is not None else args.camera, args.frames, args.realtime)
+
+    reference = runs[0]
+    started = time.perf_counter()
+    try:
+        for t, rgb in frames:
+            readings = [run.step(rgb, t) for run in runs]
+            for run, reading in zip(runs, readings):
+                run.compare(reading, reference, readings[0])
+    finally:
+        for run in runs:
+            run.backend.stop()
+
+    results = report(runs, time.perf_counter() - started, frames.dropped)
+    filter_results = report_filters(runs, args.filters) if len(args.filters) > 1 else None
+    if args.events:
+        for run in runs:
+            print(f"{run.name} flaps at: " + ', '.join(f"{t:.3f}s" for t in run.flaps))
+    if args.json:
+        source = args.video or args.landmarks or args.camera
+        with open(args.json, 'w') as f:
+            json.dump({'source': source, 'realtime': args.realtime, 'reference': reference.name,
+                       'dropped': frames.dropped, 'results': results, 'filters': filter_results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
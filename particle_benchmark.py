@@ -0,0 +1,168 @@
+"""Micro-benchmark: NumPy particle and starfield engines (effects.py) against
+the list-of-dicts code fp.py used before.
+
+    python particle_benchmark.py
+    python particle_benchmark.py --particles 10 100 1000 5000 --stars 50 500 --frames 300
+
+Each run holds a steady population: particles are emitted at the rate that
+keeps about N alive over their 0.6 s lifetime, at fp.py's 90 FPS frame time.
+A frame is what fp.py does each frame: emit, update and collect the rects for
+the compositor, then draw onto a 640x480 surface. Stars are scrolled and all
+drawn. The report gives mean milliseconds per frame for both versions, so the
+growth with N can be read down each column. No window is opened.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from effects import ParticleSystem, Starfield
+
+WIDTH, HEIGHT = 640, 480
+DT = 1 / 90
+LIFETIME = 0.6
+COLORS = [(255, 255, 0), (255, 165, 0), (57, 255, 20)]
+
+
+# --- The list-of-dicts version, as fp.py had it ---
+
+class LegacyParticles:
+    def __init__(self):
+        self.particles = []
+
+    def emit(self, x, y, color, count):
+        for _ in range(count):
+            self.particles.append({
+                'x': x, 'y': y,
+                'vx': random.uniform(-40, 0),
+                'vy': random.uniform(-15, 15),
+                'life': LIFETIME,
+                'color': color
+            })
+
+    def update(self, dt):
+        rects = []
+        for p in self.particles[:]:
+            p['life'] -= dt
+            p['x'] += p['vx'] * dt
+            p['y'] += p['vy'] * dt
+            if p['life'] <= 0:
+                self.particles.remove(p)
+                continue
+            size = int(6 * (p['life'] / LIFETIME))
+            rects.append(pygame.Rect(int(p['x']) - size, int(p['y']) - size, size * 2 + 1, size * 2 + 1))
+        return rects
+
+    def draw(self, surface):
+        for p in self.particles:
+            size = int(6 * (p['life'] / LIFETIME))
+            if size > 0:
+                pygame.draw.circle(surface, p['color'], (int(p['x']), int(p['y'])), size)
+
+
+class LegacyStars:
+    def __init__(self, count):
+        self.stars = [{'x': random.randint(0, WIDTH), 'y': random.randint(0, HEIGHT),
+                       'speed': random.uniform(10, 60)} for _ in range(count)]
+
+    def frame(self, surface, dt):
+        for star in self.stars:
+            star['x'] -= star['speed'] * dt
+            if star['x'] < 0: star['x'] = WIDTH
+            pygame.draw.circle(surface, (200, 200, 255), (int(star['x']), int(star['y'])), 1)
+
+
+class NumpyParticles:
+    def __init__(self):
+        self.system = ParticleSystem(lifetime=LIFETIME, max_size=6, seed=1)
+
+    def emit(self, x, y, color, count):
+        self.system.emit(x, y, color, count)
+
+    def update(self, dt):
+        self.system.update(dt)
+        return self.system.rects()
+
+    def draw(self, surface):
+        self.system.draw(surface)
+
+
+class NumpyStars:
+    def __init__(self, count):
+        self.stars = Starfield(WIDTH, HEIGHT, count=count, seed=1)
+
+    def frame(self, surface, dt):
+        self.stars.update(dt)
+        self.stars.draw(surface)
+
+
+# --- Runs ---
+
+def run_particles(engine, population, frames, warmup):
+    """Mean ms per frame for emit + update + rects + draw at a steady population"""
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    per_frame = population * DT / LIFETIME
+    owed = 0.0
+    elapsed = 0.0
+    for frame in range(warmup + frames):
+        surface.fill((0, 0, 0))
+        started = time.perf_counter()
+        owed += per_frame
+        count, owed = int(owed), owed - int(owed)
+        if count:
+            engine.emit(random.uniform(0, WIDTH), random.uniform(0, HEIGHT), COLORS[frame % len(COLORS)], count)
+        engine.update(DT)
+        engine.draw(surface)
+        if frame >= warmup:
+            elapsed += time.perf_counter() - started
+    return elapsed / frames * 1000
+
+def run_stars(engine, frames, warmup):
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    elapsed = 0.0
+    for frame in range(warmup + frames):
+        started = time.perf_counter()
+        engine.frame(surface, DT)
+        if frame >= warmup:
+            elapsed += time.perf_counter() - started
+    return elapsed / frames * 1000
+
+def report(title, unit, rows):
+    print(title)
+    print(f"{unit:>10}{'legacy ms':>12}{'numpy ms':>12}{'speedup':>10}")
+    for n, legacy, fast in rows:
+        print(f"{n:>10}{legacy:>12.3f}{fast:>12.3f}{legacy / fast:>9.1f}x")
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the NumPy particle and starfield engines against the old lists of dicts')
+    parser.add_argument('--particles', type=int, nargs='+', default=[10, 100, 1000, 5000], help='steady particle populations')
+    parser.add_argument('--stars', type=int, nargs='+', default=[50, 500, 5000], help='star counts')
+    parser.add_argument('--frames', type=int, default=300, help='timed frames per run')
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON, for comparing runs')
+    args = parser.parse_args()
+
+    pygame.init()
+    random.seed(1)
+    warmup = int(LIFETIME / DT) + 10
+
+    particle_rows = [(n, run_particles(LegacyParticles(), n, args.frames, warmup),
+                      run_particles(NumpyParticles(), n, args.frames, warmup)) for n in args.particles]
+    star_rows = [(n, run_stars(LegacyStars(n), args.frames, 10),
+                  run_stars(NumpyStars(n), args.frames, 10)) for n in args.stars]
+    report('Particles: emit, update, rects and draw per frame', 'particles', particle_rows)
+    report('Stars: scroll and draw per frame', 'stars', star_rows)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'frames': args.frames,
+                       'particles': [dict(count=n, legacy_ms=legacy, numpy_ms=fast) for n, legacy, fast in particle_rows],
+                       'stars': [dict(count=n, legacy_ms=legacy, numpy_ms=fast) for n, legacy, fast in star_rows]}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py opens FLAPPYBIRD_DB when imported, so point it at a scratch database first
+os.environ['FLAPPYBIRD_DB'] = os.path.join(tempfile.mkdtemp(prefix='flappybird-tests-'), 'test.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def api():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
@@ -0,0 +1,40 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gesture import LatencyTracker
+
+
+def test_stage_times_while_inferred_appends():
+    # The gesture thread records frame ages while the game reads the panel
+    tracker = LatencyTracker(window=300)
+    stop = threading.Event()
+    errors = []
+
+    def gesture_thread():
+        now = time.perf_counter()
+        while not stop.is_set():
+            tracker.inferred(now - 0.01, now)
+
+    thread = threading.Thread(target=gesture_thread)
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread.start()
+    try:
+        for _ in range(20000):
+            try:
+                tracker.stage_times()
+            except RuntimeError as exc:
+                errors.append(exc)
+                break
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(old_interval)
+
+    assert not errors
+    p50, p95 = tracker.stage_times()['frame age']
+    assert abs(p50 - 10) < 1e-6 and abs(p95 - 10) < 1e-6
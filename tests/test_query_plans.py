@@ -0,0 +1,17 @@
+def seed(client, players=20):
+    for i in range(players):
+        player_id = client.post('/api/player/register', json={'username': f'PLAN{i}'}).json['player_id']
+        client.post('/api/score/submit', json={'player_id': player_id, 'score': i * 3, 'duration': 10.0})
+
+
+def test_check_query_plans_after_analyze(api, client):
+    # benchmark.py seed runs ANALYZE; the plans must stay bounded on such a database
+    seed(client)
+    conn = api.connect_db()
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+    result = api.app.test_cli_runner().invoke(args=['check-query-plans'])
+    assert result.exit_code == 0, result.output
+    assert 'FAIL' not in result.output
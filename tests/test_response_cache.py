@@ -0,0 +1,53 @@
+import threading
+import time
+
+
+def test_slow_fill_does_not_block_other_keys(api):
+    cache = api.ResponseCache()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'slow'
+
+    thread = threading.Thread(target=cache.get_or_compute, args=(('leaderboard', 'week', 50), slow))
+    thread.start()
+    started.wait(5)
+    try:
+        began = time.monotonic()
+        assert cache.get_or_compute(('data_version',), lambda: (1, 1)) == (1, 1)
+        assert time.monotonic() - began < 1
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_identical_misses_compute_once(api):
+    cache = api.ResponseCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'board'
+
+    threads = [threading.Thread(target=cache.get_or_compute, args=(('leaderboard', 'all', 10), compute)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 7
+    assert not cache._fills
+
+
+def test_etag_lookups_not_counted(api, client):
+    api.response_cache.invalidate()
+    before = api.response_cache.stats()
+    client.get('/api/stats/global')
+    client.get('/api/stats/global')
+    after = api.response_cache.stats()
+    # One miss and one hit for the stats themselves; the ETag's data_version reads don't count
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 1
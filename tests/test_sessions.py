@@ -0,0 +1,41 @@
+import pytest
+
+
+def register(client, username):
+    return client.post('/api/player/register', json={'username': username}).get_json()['player_id']
+
+
+@pytest.mark.parametrize('field, value', [
+    ('score', '999'),
+    ('score', True),
+    ('score', [1]),
+    ('duration', 'long'),
+    ('pipes_passed', {'n': 3}),
+])
+def test_submit_rejects_non_numeric_values(client, field, value):
+    player_id = register(client, 'TYPECHECK')
+    session = dict({'player_id': player_id, 'score': 5, 'duration': 12.5}, **{field: value})
+
+    r = client.post('/api/score/submit', json=session)
+
+    assert r.status_code == 400
+    assert r.get_json()['error'] == f'{field} must be a number'
+    assert client.get(f'/api/player/{player_id}/stats').get_json()['stats']['total_games'] == 0
+
+
+def test_batch_rejects_non_numeric_items_only(client):
+    player_id = register(client, 'BATCHTYPE')
+    before = client.get('/api/stats/global').get_json()['stats']['total_games']
+
+    r = client.post('/api/score/submit_batch', json={'sessions': [
+        {'player_id': player_id, 'score': 7, 'duration': 20},
+        {'player_id': player_id, 'score': 'zzz', 'duration': 20},
+    ]})
+
+    body = r.get_json()
+    assert r.status_code == 200
+    assert (body['accepted'], body['rejected']) == (1, 1)
+    assert body['results'][1]['error'] == 'score must be a number'
+    stats = client.get('/api/stats/global').get_json()['stats']
+    assert stats['total_games'] == before + 1
+    assert isinstance(stats['highest_score'], int)
@@ -0,0 +1,105 @@
+"""Rendered-text cache shared by fp.py and game_multiplayer.py.
+
+Most text on screen (titles, labels, the score, leaderboard rows) is the same
+from one frame to the next, yet font.render rasterises it from scratch every
+time. TextCache keeps the rendered surfaces in a bounded LRU keyed by (text,
+font, colour, shadow), so a frame only pays for text that actually changed.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+
+class TextCache:
+    """Bounded LRU of rendered text surfaces.
+
+    With a shadow colour the shadow is baked into the same surface, offset by
+    SHADOW_OFFSET pixels down and right of the text, so shadowed text costs one
+    blit. Cached surfaces are shared: blit them, never draw on them.
+    """
+
+    SHADOW_OFFSET = 3
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, color, shadow=None):
+        """Antialiased `text` in `color`, with a `shadow` colour drop shadow if given"""
+        key = (text, font, color, shadow)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        if shadow is not None:
+            surface = self.bake_shadow(surface, font.render(text, True, shadow))
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def bake_shadow(self, front, back):
+        """`front` over `back` shifted by SHADOW_OFFSET, in one surface.
+
+        A plain blit between two SRCALPHA surfaces blends colour as if the
+        target were opaque, which darkens the antialiased edges, so the "over"
+        operator is done here instead. Blitting the result matches blitting
+        `back` and then `front` to within rounding.
+        """
+        offset = self.SHADOW_OFFSET
+        w, h = front.get_size()
+        # Both layers on the baked canvas as float colour (w, h, 3) and alpha (w, h)
+        front_rgb = np.zeros((w + offset, h + offset, 3))
+        front_a = np.zeros((w + offset, h + offset))
+        back_rgb, back_a = np.zeros_like(front_rgb), np.zeros_like(front_a)
+        front_rgb[:w, :h] = pygame.surfarray.array3d(front)
+        front_a[:w, :h] = pygame.surfarray.array_alpha(front) / 255.0
+        back_rgb[offset:, offset:] = pygame.surfarray.array3d(back)
+        back_a[offset:, offset:] = pygame.surfarray.array_alpha(back) / 255.0
+
+        alpha = front_a + back_a * (1 - front_a)
+        rgb = front_rgb * front_a[..., None] + back_rgb * (back_a * (1 - front_a))[..., None]
+        rgb /= np.maximum(alpha, 1e-6)[..., None]
+
+        baked = pygame.Surface((w + offset, h + offset), pygame.SRCALPHA)
+        pygame.surfarray.blit_array(baked, np.rint(rgb).astype(np.uint8))
+        pygame.surfarray.pixels_alpha(baked)[:] = np.rint(alpha * 255).astype(np.uint8)
+        return baked
+
+    def text_rect(self, surface, shadow=False, **anchor):
+        """Rect of the text itself (without its shadow) in `surface`, placed by
+        a Rect keyword like center=(x, y) or topleft=(x, y)"""
+        rect = surface.get_rect()
+        if shadow:
+            rect.width -= self.SHADOW_OFFSET
+            rect.height -= self.SHADOW_OFFSET
+        for name, value in anchor.items():
+            setattr(rect, name, value)
+        return rect
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'size': len(self.surfaces),
+            'capacity': self.capacity,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return (f"Text cache: {stats['hit_rate']:.1%} hits ({stats['hits']} of {stats['hits'] + stats['misses']} renders), "
+                f"{stats['size']}/{stats['capacity']} surfaces, {stats['evictions']} evicted")